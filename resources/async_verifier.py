@@ -0,0 +1,217 @@
+import asyncio
+import json
+import time
+import urllib.parse
+
+import aiohttp
+
+from resources.exceptions import VerifierRequestException
+from resources.parsers import parse_certificate_date, parse_view_details
+from resources.verifier import MahareraitVerifier
+import resources.templates as templates
+import resources.xpaths as xpaths
+
+
+class AsyncResponse(object):
+    # Just enough of requests.Response for get_etree, get_hidden_payload and the extractors.
+    def __init__(self, status_code, content, headers, encoding=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncMahareraitVerifier(MahareraitVerifier):
+    concurrency_limit = 100
+
+    def __init__(self, to_verify):
+        super().__init__(to_verify)
+        self.async_session = None
+        self.semaphore = None
+        self.parse_semaphore = None
+
+    def get_async_session(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency_limit, ssl=False)
+        return aiohttp.ClientSession(headers=self.headers, connector=connector)
+
+    async def async_smart_request(self, type_of_request, url, **kwargs):
+        number_retries = kwargs.pop('number_retries', None)
+        updated_kwargs = {**self.timeout_setting, **kwargs}
+        if number_retries is None:
+            number_retries = self.number_retries
+
+        # requests style keyword arguments -> aiohttp
+        if updated_kwargs.pop('verify', True) is False:
+            updated_kwargs['ssl'] = False
+        updated_kwargs['timeout'] = aiohttp.ClientTimeout(total=updated_kwargs.pop('timeout', None))
+
+        if self.response_cache is not None:
+            response = await self.run_blocking(self.response_cache.get, type_of_request, url, kwargs.get('data'))
+            if response is not None:
+                return response
+
+        retry_state = self.retry_policy.start(number_retries)
+        while True:
+            response = None
+            delay = self.rate_limiter.reserve(url)
+            if delay:
+                await asyncio.sleep(delay)
+            started = time.monotonic()
+            try:
+                async with self.semaphore:
+                    async with self.async_session.request(type_of_request, url, **updated_kwargs) as resp:
+                        content = await resp.read()
+                        response = AsyncResponse(resp.status, content, resp.headers, resp.charset)
+            except asyncio.TimeoutError:
+                self.rate_limiter.record(url, error=True)
+                error_class = 'timeout'
+            except aiohttp.ClientConnectionError as e:
+                print(e)
+                self.rate_limiter.record(url, error=True)
+                error_class = 'connection'
+            else:
+                self.rate_limiter.record(url, time.monotonic() - started, response.status_code)
+                if not self.retry_policy.should_retry_status(response.status_code):
+                    if self.response_cache is not None and self.request_ok(response.status_code):
+                        await self.run_blocking(self.response_cache.set, type_of_request, url, kwargs.get('data'),
+                                                response)
+                    return response
+                error_class = 'status'
+
+            delay = retry_state.next_delay(error_class, response)
+            if delay is None:
+                if response is not None:
+                    return response
+                raise VerifierRequestException
+            print(f'Request failed ({error_class}), retrying after {delay:.1f} seconds')
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def run_blocking(func, *args):
+        # Disk work (cache files, SQLite stores, writers) goes to the default thread pool, so it never holds up
+        # the requests in flight on the event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def async_pre_query(self, districts=None):
+        self.semaphore = asyncio.Semaphore(self.concurrency_limit)
+        self.parse_semaphore = asyncio.Semaphore(self.parse_queue_size)
+
+        async with self.get_async_session() as self.async_session:
+            resp = await self.async_smart_request("GET", self.pre_query_url, headers=self.headers, verify=False)
+
+            hidden_payload = self.get_hidden_payload(resp)
+
+            self.token = hidden_payload.get('__RequestVerificationToken')
+            try:
+                return await self.async_search_query(districts)
+            finally:
+                self.close_writers()
+                self.close_parse_pool()
+
+    async def async_get_districts(self):
+        payload = {"DivID": self.maharashtra_state_id}  # State id of maharashtra hardcoded.
+
+        resp = await self.async_smart_request("POST", self.get_district_url, headers=self.headers, data=payload,
+                                              verify=False)
+        return resp.json()
+
+    async def async_show_certificate(self, qstr):
+        payload = {"ID": qstr}
+
+        resp = await self.async_smart_request("POST", self.show_certificate_url, headers=self.headers, data=payload,
+                                              verify=False)
+        return resp.content
+
+    async def async_view_details_query(self, url, project_data=None):
+        resp = await self.async_smart_request("GET", url, headers=self.headers, verify=False)
+        return await self.async_parse(parse_view_details, resp.content, project_data)
+
+    async def async_parse(self, parse, *args):
+        parse_pool = self.get_parse_pool()
+        if parse_pool is None:
+            return parse(*args, verifier=self)
+
+        # Same bound as the threaded pipeline, but waiting on the event loop instead of blocking it.
+        async with self.parse_semaphore:
+            return await asyncio.get_running_loop().run_in_executor(parse_pool.executor, parse, *args)
+
+    async def async_search_query(self, districts=None):
+        all_districts = self.filter_districts(await self.async_get_districts(), districts)
+
+        # Every district is its own task, pages and projects fan out further down.
+        await asyncio.gather(*(self.async_crawl_district(district) for district in all_districts))
+
+    async def async_query_listing_page(self, district_id, current_page):
+        payload_data = templates.search_query_template(self.token, self.maharashtra_state_id, district_id,
+                                                       current_page)
+        payload = urllib.parse.urlencode(payload_data)
+
+        header = {**self.headers, "content-type": "application/x-www-form-urlencoded"}
+
+        resp = await self.async_smart_request("POST", self.search_query_url, headers=header, data=payload,
+                                              verify=False)
+        return self.get_etree(resp)
+
+    async def async_crawl_district(self, district):
+        district_id = district.get("ID")
+        district_name = district.get("Text")
+
+        try:
+            tree = await self.async_query_listing_page(district_id, 0)
+            total_pages = self.safe_int(
+                xpaths.total_pages(tree)[0])
+        except Exception as exc:
+            print(f"Could not fetch first page of '{district_name}'", exc)
+            return
+
+        await self.run_blocking(self.save_projects, await self.async_extract_projects_list_data(tree))
+
+        await asyncio.gather(*(self.async_crawl_page(district_id, district_name, i) for i in range(1, total_pages)))
+
+    async def async_crawl_page(self, district_id, district_name, current_page):
+        try:
+            tree = await self.async_query_listing_page(district_id, current_page)
+            result_list = await self.async_extract_projects_list_data(tree)
+        except Exception as exc:
+            print(f"Could not fetch page {current_page} of '{district_name}'", exc)
+            return
+
+        await self.run_blocking(self.save_projects, result_list)
+
+    async def async_extract_projects_list_data(self, tree):
+        rows = await self.run_blocking(self.extract_project_rows, tree)
+
+        # gather keeps the results in row order.
+        return await asyncio.gather(*(self.async_fetch_project_data(row) for row in rows))
+
+    async def async_fetch_project_data(self, row):
+        project_data, view_details_url, certificate_qstr = row
+
+        project_data = await self.async_view_details_query(view_details_url, project_data)
+
+        certificate_id = project_data["View Certificate"]
+        certificate_date = await self.run_blocking(self.get_certificate_store().get_date, certificate_id)
+
+        if certificate_date:
+            project_data["Certificate Date"] = certificate_date
+        elif certificate_qstr:
+            try:
+                certificate_data = await self.async_show_certificate(certificate_qstr)
+                project_data["Certificate Date"] = await self.async_parse(parse_certificate_date, certificate_data)
+                await self.run_blocking(self.store_certificate, certificate_id, project_data["Certificate Date"],
+                                        certificate_data)
+            except Exception as exc:
+                print("Could not find certificate data", exc)
+
+        return project_data
+
+    @classmethod
+    def fetch_data(cls, districts=None):
+        return asyncio.run(cls(None).async_pre_query(districts))
@@ -1,10 +1,17 @@
+import threading
 import time
+from contextlib import contextmanager
 
 from lxml import etree
 from requests import session, codes
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout, ConnectionError
 
 from resources.exceptions import VerifierRequestException
+from resources.rate_limiter import AdaptiveRateLimiter
+from resources.retry import RetryPolicy
+from resources.session_pool import SessionPool
+import resources.xpaths as xpaths
 
 
 class BaseVerifier(object):
@@ -21,11 +28,28 @@ class BaseVerifier(object):
         "timeout": 1000
     }
     number_retries = 20
+    retry_settings = dict()
+    # Shared by every verifier in the process, so all requests to a host draw from the same bucket.
+    rate_limiter = AdaptiveRateLimiter()
+    # urllib3 pool sizing for every mounted adapter, retries are left to smart_request.
+    pool_connections = 4
+    pool_maxsize = 32
+    pool_block = False
+    # Sessions kept per verifier class for concurrent workers, shared across instances.
+    session_pool_size = 16
+    session_pools = dict()
+    session_pools_lock = threading.Lock()
+    # A resources.cache.ResponseCache, or None to always hit the network.
+    response_cache = None
     proxy_class = 'default'
 
     def __init__(self, proxy=None):
         self.validity = None
+        self.proxy = proxy
         self.session = self.get_requests_session(proxy=proxy)
+        self.local = threading.local()
+        # One policy per verifier, so the crawl wide retry budget is shared by all of its workers.
+        self.retry_policy = RetryPolicy(**self.retry_settings)
 
     @classmethod
     def get_requests_session(cls, proxy=None):
@@ -36,37 +60,89 @@ class BaseVerifier(object):
                 'https': None
             }
         requests_session.headers.update(cls.headers)
+        requests_session.headers.setdefault('connection', 'keep-alive')
+
+        adapter = HTTPAdapter(pool_connections=cls.pool_connections, pool_maxsize=cls.pool_maxsize,
+                              pool_block=cls.pool_block, max_retries=0)
+        requests_session.mount('https://', adapter)
+        requests_session.mount('http://', adapter)
 
         return requests_session
 
+    @classmethod
+    def get_session_pool(cls, proxy=None):
+        key = (cls, proxy)
+        with cls.session_pools_lock:
+            pool = cls.session_pools.get(key)
+            if pool is None:
+                pool = cls.session_pools[key] = SessionPool(lambda: cls.get_requests_session(proxy=proxy),
+                                                            cls.session_pool_size)
+        return pool
+
+    @contextmanager
+    def borrowed_session(self):
+        # Lends a warm pooled session to the calling thread, smart_request picks it up through self.local.
+        with self.get_session_pool(self.proxy).borrow() as pooled_session:
+            pooled_session.cookies.update(self.session.cookies)
+            self.local.session = pooled_session
+            try:
+                yield pooled_session
+            finally:
+                self.local.session = None
+
+    def get_current_session(self):
+        # Threads holding a borrowed session use it, everything else uses self.session.
+        return getattr(self.local, 'session', None) or self.session
+
     def smart_request(self, type_of_request, url, **kwargs):
-        count = 0
         number_retries = kwargs.pop('number_retries', None)
         updated_kwargs = {**self.timeout_setting, **kwargs}
         if number_retries is None:
             number_retries = self.number_retries
-        while count < number_retries:
+
+        # Streamed bodies are consumed by the caller, so they are never cached.
+        use_cache = self.response_cache is not None and not kwargs.get('stream')
+        if use_cache:
+            response = self.response_cache.get(type_of_request, url, kwargs.get('data'))
+            if response is not None:
+                return response
+
+        retry_state = self.retry_policy.start(number_retries)
+        while True:
+            response = None
+            self.rate_limiter.acquire(url)
+            started = time.monotonic()
             try:
+                current_session = self.get_current_session()
                 if type_of_request == 'GET':
-                    response = self.session.get(url, **updated_kwargs)
+                    response = current_session.get(url, **updated_kwargs)
                 elif type_of_request == 'POST':
-                    response = self.session.post(url, **updated_kwargs)
+                    response = current_session.post(url, **updated_kwargs)
                 else:
-                    response = self.session.request(type_of_request, url, **updated_kwargs)
-                return response
+                    response = current_session.request(type_of_request, url, **updated_kwargs)
             except Timeout:
-                count += 1
-                print('Timeout Happened, Retrying after 60 seconds')
-                time.sleep(60)
-                continue
+                self.rate_limiter.record(url, error=True)
+                error_class = 'timeout'
             except ConnectionError as e:
                 print(e)
-                count += 0.1
-                print('Timeout Happened, Retrying after 60 seconds')
-                time.sleep(60)
-                continue
-        else:
-            raise VerifierRequestException
+                self.rate_limiter.record(url, error=True)
+                error_class = 'connection'
+            else:
+                self.rate_limiter.record(url, time.monotonic() - started, response.status_code)
+                if not self.retry_policy.should_retry_status(response.status_code):
+                    if use_cache and self.request_ok(response.status_code):
+                        self.response_cache.set(type_of_request, url, kwargs.get('data'), response)
+                    return response
+                error_class = 'status'
+
+            delay = retry_state.next_delay(error_class, response)
+            if delay is None:
+                if response is not None:
+                    # Out of retries on a bad status, let the caller look at the response.
+                    return response
+                raise VerifierRequestException
+            print(f'Request failed ({error_class}), retrying after {delay:.1f} seconds')
+            time.sleep(delay)
 
     # @classmethod
     # def get_html_session(cls):
@@ -117,6 +193,6 @@ class BaseVerifier(object):
     @classmethod
     def get_hidden_payload(cls, response):
         tree = cls.get_etree(response)
-        hidden_inputs = tree.xpath("//form//input[@type='hidden']")
+        hidden_inputs = xpaths.hidden_inputs(tree)
         hidden_payload = {x.attrib.get('name'): x.attrib.get('value') for x in hidden_inputs}
         return hidden_payload
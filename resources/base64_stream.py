@@ -0,0 +1,33 @@
+import binascii
+import re
+
+NOT_BASE64 = re.compile(rb"[^A-Za-z0-9+/=]")
+
+
+def decode(payload):
+    # a2b_base64 reads any bytes-like object and skips characters outside the alphabet (quotes, line breaks),
+    # the same as base64.b64decode, without the str -> bytes copy in between.
+    if isinstance(payload, str):
+        payload = payload.encode("ascii", "ignore")
+    return binascii.a2b_base64(memoryview(payload))
+
+
+class Base64StreamDecoder(object):
+    # Decodes a base64 payload chunk by chunk into "output" (any writable file), carrying the characters
+    # that do not make up a full 4 character quantum over to the next chunk.
+    def __init__(self, output):
+        self.output = output
+        self.pending = b""
+
+    def feed(self, chunk):
+        data = self.pending + NOT_BASE64.sub(b"", chunk)
+        usable = len(data) - len(data) % 4
+
+        self.output.write(binascii.a2b_base64(memoryview(data)[:usable]))
+        self.pending = data[usable:]
+
+    def close(self):
+        if self.pending:
+            self.output.write(binascii.a2b_base64(self.pending))
+            self.pending = b""
+        return self.output
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import zlib
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+DAY = 24 * 60 * 60
+
+
+class ResponseCache(object):
+    max_bytes = 1024 * 1024 * 1024
+    compression_level = 6
+    # Seconds to keep a response, matched on the URL path. Endpoints not listed here are never cached.
+    ttls = {
+        "/searchlist/getdistrict": 30 * DAY,
+        "/searchlist/gettaluka": 30 * DAY,
+        "/searchlist/showcertificate": 90 * DAY,
+        "/printpreview/printpreview": 1 * DAY,
+    }
+
+    def __init__(self, directory, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Unknown cache setting '{name}'")
+            setattr(self, name, value)
+
+        self.directory = directory
+        self.total_bytes = None
+        self.lock = threading.Lock()
+
+    def get_ttl(self, url):
+        # The listing links are appended to a base URL ending in '/', so paths can start with '//'.
+        path = "/" + urllib.parse.urlsplit(url).path.lower().lstrip("/")
+        return self.ttls.get(path)
+
+    @staticmethod
+    def get_key(method, url, data=None):
+        if isinstance(data, dict):
+            data = urllib.parse.urlencode(sorted(data.items()))
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        digest = hashlib.sha256()
+        for part in (method.upper().encode("utf-8"), url.encode("utf-8"), data or b""):
+            digest.update(part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, method, url, data=None):
+        ttl = self.get_ttl(url)
+        if ttl is None:
+            return None
+
+        path = self.get_path(self.get_key(method, url, data))
+        try:
+            with open(path, "rb") as f:
+                raw = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+        meta, _, body = raw.partition(b"\n")
+        meta = json.loads(meta)
+
+        if time.time() - meta["stored_at"] > ttl:
+            self.remove(path)
+            return None
+
+        try:
+            # Reads bump the mtime, which is what eviction orders by.
+            os.utime(path)
+        except OSError:
+            pass
+
+        response = Response()
+        response.status_code = meta["status_code"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = meta["encoding"]
+        response.url = url
+        response._content = body
+        return response
+
+    def set(self, method, url, data, response):
+        if self.get_ttl(url) is None:
+            return
+
+        meta = {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "stored_at": time.time(),
+        }
+        raw = zlib.compress(json.dumps(meta).encode("utf-8") + b"\n" + response.content, self.compression_level)
+
+        path = self.get_path(self.get_key(method, url, data))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            print("Could not write to response cache", exc)
+            return
+
+        self.account(len(raw) - old_size)
+
+    def discard(self, method, url, data=None):
+        self.remove(self.get_path(self.get_key(method, url, data)))
+
+    def remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        self.account(-size)
+
+    def scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def account(self, delta):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.scan())
+            else:
+                self.total_bytes += delta
+
+            if self.total_bytes <= self.max_bytes:
+                return
+
+            # LRU: drop the least recently used entries until we are back under 90% of the limit.
+            for _, size, path in sorted(self.scan()):
+                if self.total_bytes <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self.total_bytes -= size
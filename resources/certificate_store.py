@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+import time
+
+
+class CertificateStore(object):
+    # Registration certificates never change, so whatever we extracted once is kept for good.
+    def __init__(self, path):
+        self.path = path
+        # Shared by every worker process, WAL lets readers and the single writer proceed side by side.
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS certificates ("
+                "certificate TEXT PRIMARY KEY, "
+                "certificate_date TEXT NOT NULL, "
+                "pdf BLOB, "
+                "stored_at REAL NOT NULL)"
+            )
+
+    def get_date(self, certificate):
+        if not certificate:
+            return None
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT certificate_date FROM certificates WHERE certificate = ?", (certificate,)
+            ).fetchone()
+        return row and row[0]
+
+    def get_pdf(self, certificate):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT pdf FROM certificates WHERE certificate = ?", (certificate,)
+            ).fetchone()
+        return row and row[0]
+
+    def add(self, certificate, certificate_date, pdf=None):
+        if not certificate or not certificate_date:
+            return
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO certificates (certificate, certificate_date, pdf, stored_at) "
+                "VALUES (?, ?, ?, ?)",
+                (certificate, certificate_date, pdf, time.time())
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from resources.work_queue import Task
+
+
+class Coordinator(object):
+    # Hands out (district, page range) shards from a WorkQueue to workers over HTTP. A district starts as a
+    # single shard for its first page, once a worker reports the number of pages the rest is split into
+    # shards of shard_pages pages.
+    def __init__(self, work_queue, shard_pages=10):
+        self.work_queue = work_queue
+        self.shard_pages = shard_pages
+        # When a worker last talked to us, so the coordinator can tell that none is left.
+        self.last_contact = time.monotonic()
+
+    @staticmethod
+    def shard(district_id, district, start, stop):
+        return f"shard:{district_id}:{start}", {"district_id": district_id, "district": district,
+                                                "start": start, "stop": stop}
+
+    def seed(self, districts):
+        self.work_queue.put_many("shard", [
+            self.shard(district.get("ID"), district.get("Text"), 0, 1) for district in districts
+        ])
+
+    def handle(self, path, body):
+        if "worker" in body:
+            self.last_contact = time.monotonic()
+
+        if path == "/status":
+            return {"counts": self.work_queue.counts(), "drained": self.work_queue.is_drained()}
+
+        if path == "/lease":
+            task = self.work_queue.lease(body["worker"])
+            if task is None:
+                return {"task": None, "drained": self.work_queue.is_drained()}
+            return {"task": {"id": task.id, "kind": task.kind, "key": task.key, "payload": task.payload,
+                             "attempts": task.attempts}}
+
+        task = Task(body["id"], None, None, None, None, body["worker"])
+
+        if path == "/renew":
+            return {"ok": self.work_queue.renew(task)}
+
+        if path == "/fail":
+            self.work_queue.fail(task, body.get("error"))
+            return {"ok": True}
+
+        if path == "/ack":
+            # The district is split from the shard as it was queued, and only if this worker still holds it.
+            stored = self.work_queue.get(task.id)
+            total_pages = body.get("total_pages")
+            follow_up = []
+            if total_pages and stored is not None and stored.kind == "shard" and stored.payload["start"] == 0:
+                payload = stored.payload
+                follow_up = [
+                    ("shard", *self.shard(payload["district_id"], payload["district"], start,
+                                          min(start + self.shard_pages, total_pages)))
+                    for start in range(1, total_pages, self.shard_pages)
+                ]
+            return {"ok": self.work_queue.ack(task, body.get("result"), follow_up)}
+
+        raise KeyError(path)
+
+    def serve(self, host, port):
+        self.last_contact = time.monotonic()
+        server = ThreadingHTTPServer((host, port), CoordinatorHandler)
+        server.coordinator = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.respond({})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.respond(json.loads(self.rfile.read(length) or b"{}"))
+
+    def respond(self, body):
+        try:
+            status, data = 200, self.server.coordinator.handle(self.path, body)
+        except KeyError as exc:
+            status, data = 400, {"error": f"Missing {exc}"}
+        except Exception as exc:
+            status, data = 500, {"error": repr(exc)}
+
+        content = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class CoordinatorClient(object):
+    # Worker side of the coordinator API. A coordinator that is not up yet, restarting or overloaded is waited
+    # for, with the delay between attempts doubling up to max_delay seconds. Only its own "drained" answer
+    # ends a worker.
+    def __init__(self, url, worker, timeout=60, max_delay=30):
+        self.url = url.rstrip("/")
+        self.worker = worker
+        self.timeout = timeout
+        self.max_delay = max_delay
+        self.session = requests.Session()
+
+    def post(self, path, body):
+        failures = 0
+        while True:
+            try:
+                resp = self.session.post(self.url + path, json={"worker": self.worker, **body}, timeout=self.timeout)
+                if resp.status_code < 500:
+                    # A 4xx is a bad request, asking again would not change the answer.
+                    resp.raise_for_status()
+                    return resp.json()
+                error = f"HTTP {resp.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error = exc
+
+            failures += 1
+            delay = min(2 ** (failures - 1), self.max_delay)
+            print(f"Coordinator request {path} failed, retrying after {delay} seconds", error)
+            time.sleep(delay)
+
+    def lease(self):
+        # (task, drained)
+        data = self.post("/lease", {})
+        return data.get("task"), data.get("drained", False)
+
+    def renew(self, task):
+        return self.post("/renew", {"id": task["id"]})["ok"]
+
+    def ack(self, task, result, total_pages=None):
+        return self.post("/ack", {"id": task["id"], "result": result, "total_pages": total_pages})["ok"]
+
+    def fail(self, task, error):
+        self.post("/fail", {"id": task["id"], "error": error})
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+
+
+class ProjectJournal(object):
+    # Append-only log of every finished project, one JSON line each, fsynced before the project counts as done.
+    # A checkpoint line records how far the CSV is known to be on disk, the projects after the last checkpoint
+    # are the ones a crashed run still has to write. Every compact_every lines the log is rewritten as a single
+    # line with the finished keys.
+    def __init__(self, path, compact_every=1000):
+        self.path = path
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        # keys of every finished project
+        self.done = set()
+        # project data journaled after the last checkpoint
+        self.pending = []
+        self.csv_offset = None
+        self.entries = 0
+
+        self.load()
+        self.file = open(path, 'ab')
+
+    def load(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+
+        valid_size = 0
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash, nothing after it was committed.
+                    break
+                if not line.endswith(b"\n"):
+                    break
+
+                valid_size += len(line)
+                self.entries += 1
+                self.apply(entry)
+
+        if valid_size < os.path.getsize(self.path):
+            os.truncate(self.path, valid_size)
+
+    def apply(self, entry):
+        op = entry.get("op")
+        if op == "project":
+            self.done.add(entry["key"])
+            self.pending.append(entry["data"])
+        elif op == "checkpoint":
+            self.csv_offset = entry["csv_offset"]
+            self.pending.clear()
+        elif op == "compacted":
+            self.done = set(entry["done"])
+            self.csv_offset = entry["csv_offset"]
+            self.pending.clear()
+
+    def append(self, entry):
+        self.file.write(json.dumps(entry).encode("utf-8") + b"\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.entries += 1
+
+    def is_done(self, key):
+        return key in self.done
+
+    def add(self, key, data):
+        with self.lock:
+            self.append({"op": "project", "key": key, "data": data})
+            self.done.add(key)
+            self.pending.append(data)
+
+    def checkpoint(self, csv_offset):
+        with self.lock:
+            self.append({"op": "checkpoint", "csv_offset": csv_offset})
+            self.csv_offset = csv_offset
+            self.pending.clear()
+
+            if self.entries >= self.compact_every:
+                self.compact()
+
+    def reset(self, csv_offset):
+        # A finished crawl, the next one fetches everything again.
+        with self.lock:
+            self.done.clear()
+            self.pending.clear()
+            self.csv_offset = csv_offset
+            self.compact()
+
+    def compact(self):
+        entry = {"op": "compacted", "done": sorted(self.done), "csv_offset": self.csv_offset}
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(json.dumps(entry).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.file.close()
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, 'ab')
+        self.entries = 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,76 @@
+def normalize_space(text):
+    return " ".join(text.split())
+
+
+class LabelIndex(object):
+    # One walk over the detail page replacing the per field
+    # "//label[text()[normalize-space() = ...]]/../following-sibling::div[1]" lookups.
+    #
+    # A heading's section is what the XPath version searched: the following sibling divs of the heading's
+    # parent, for every occurrence of the heading. Labels inside a section are also recorded under
+    # (heading, label), so a label missing from its section never picks up a value from elsewhere.
+    def __init__(self, tree, labels, headings=()):
+        # label or (heading, label) -> [value element] for <label> elements, in document order
+        self.label_values = dict()
+        # label or (heading, label) -> [value element] for any other element carrying the text
+        self.text_values = dict()
+        # section root element -> headings it belongs to
+        self.sections = dict()
+
+        for element in tree.iter():
+            if not isinstance(element.tag, str):
+                continue
+
+            for text in self.iter_text_nodes(element):
+                normalized = normalize_space(text)
+
+                if normalized in headings and element.getparent() is not None:
+                    for section in element.getparent().itersiblings("div"):
+                        self.sections.setdefault(section, set()).add(normalized)
+
+                if normalized not in labels:
+                    continue
+
+                # //*[text()[...]]/following-sibling::div[1]
+                value = next(element.itersiblings("div"), None)
+                if value is not None:
+                    self.add(self.text_values, element, normalized, value)
+
+                # //label[text()[...]]/../following-sibling::div[1]
+                if element.tag == "label" and element.getparent() is not None:
+                    value = next(element.getparent().itersiblings("div"), None)
+                    if value is not None:
+                        self.add(self.label_values, element, normalized, value)
+
+    def add(self, values, element, label, value):
+        values.setdefault(label, []).append(value)
+
+        if not self.sections:
+            return
+        headings = set()
+        for ancestor in element.iterancestors():
+            headings.update(self.sections.get(ancestor, ()))
+        for heading in headings:
+            values.setdefault((heading, label), []).append(value)
+
+    @staticmethod
+    def iter_text_nodes(element):
+        if element.text:
+            yield element.text
+        for child in element:
+            if child.tail:
+                yield child.tail
+
+    @staticmethod
+    def find(values, label, heading=None):
+        matches = values.get((heading, label) if heading else label)
+        return matches[0] if matches else None
+
+    def get(self, label, heading=None):
+        value = self.find(self.label_values, label, heading)
+        if value is None:
+            value = self.find(self.text_values, label, heading)
+
+        label_data = value is not None and value.text or ""
+
+        return label_data.replace("\r\n", "").strip()
@@ -0,0 +1,91 @@
+import re
+
+MULTIPLE_DOTS = re.compile(r"\.+")
+
+
+class KeepDigitsTable(dict):
+    # str.translate table that drops everything except decimal digits and dots, same as re.sub(r'[^\d.]', '', ...).
+    # Decisions are cached per code point on first sight.
+    def __missing__(self, key):
+        char = chr(key)
+        value = char if char == "." or char.isdecimal() else None
+        self[key] = value
+        return value
+
+
+KEEP_DIGITS = KeepDigitsTable()
+
+
+def is_clean(value):
+    # "123", "12.5", ".5" and "12." come out of clean_number unchanged, so they can skip it.
+    if value.isdecimal():
+        return True
+    return value.count(".") == 1 and len(value) > 1 and value.replace(".", "", 1).isdecimal()
+
+
+def clean_number(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    if is_clean(value):
+        return value
+
+    # Remove all non-digit and non-dot characters
+    cleaned_value = value.translate(KEEP_DIGITS)
+
+    # Replace consecutive dots with a single dot
+    if ".." in cleaned_value:
+        cleaned_value = MULTIPLE_DOTS.sub(".", cleaned_value)
+
+    return cleaned_value
+
+
+def safe_float(value) -> float:
+    if isinstance(value, float):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str) and value.isdecimal():
+        return float(value)
+
+    cleaned_number = clean_number(value)
+
+    try:
+        result = cleaned_number and float(cleaned_number) or 0.0
+        return result
+    except ValueError:
+        return 0.0
+
+
+def safe_int(value) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        return value.is_integer() and int(value) or 0
+    if isinstance(value, str) and value.isdecimal():
+        return int(value)
+
+    cleaned_number = clean_number(value)
+
+    try:
+        result = cleaned_number and int(cleaned_number) or 0
+        return result
+    except ValueError:
+        return 0
+
+
+def convert_column(values, converter):
+    # Table columns repeat the same few cell texts ("1", "0", "2BHK"...), so each distinct one is converted once.
+    converted = dict()
+    result = []
+    for value in values:
+        try:
+            result.append(converted[value])
+        except KeyError:
+            result.append(converted.setdefault(value, converter(value)))
+    return result
+
+
+def safe_float_column(values):
+    return convert_column(values, safe_float)
@@ -0,0 +1,48 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Module level so they can be pickled into the parser processes. Each process builds one verifier
+# (init_parser) and extracts with it, in-process callers pass their own verifier instead.
+parser = None
+
+
+def init_parser(verifier_class):
+    global parser
+    parser = verifier_class(None)
+
+
+def parse_view_details(content, project_data=None, verifier=None):
+    return (verifier or parser).extract_view_details_data(content, project_data)
+
+
+def parse_certificate_date(certificate, verifier=None):
+    return (verifier or parser).extract_certificate_date(certificate)
+
+
+class ParsePool(object):
+    # lxml and PyPDF2 are CPU bound and hold the GIL, so parsing runs in worker processes while the
+    # fetching threads keep downloading. At most max_pending payloads wait for a parser, beyond that
+    # submit() blocks the fetcher until one is done.
+    # The parser processes are started on the first submit(), from a fetching thread. Forking there would copy
+    # the other threads' locks in whatever state they are in, so they come from a forkserver (spawn where
+    # there is none).
+    def __init__(self, verifier_class, processes, max_pending):
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(start_method),
+                                            initializer=init_parser, initargs=(verifier_class,))
+        self.pending = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, parse, *args):
+        self.pending.acquire()
+        try:
+            future = self.executor.submit(parse, *args)
+        except Exception:
+            self.pending.release()
+            raise
+
+        future.add_done_callback(lambda _: self.pending.release())
+        return future
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,51 @@
+import sqlite3
+import threading
+import time
+
+
+class ProjectIndex(object):
+    # Remembers the listing's "Last Modified Date" for every certificate number we have already saved.
+    def __init__(self, path):
+        self.path = path
+        # Worker processes share the file, so like the work queue it runs in WAL mode with a long busy timeout.
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "certificate TEXT PRIMARY KEY, "
+                "last_modified TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def get_last_modified(self, certificate):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT last_modified FROM projects WHERE certificate = ?", (certificate,)
+            ).fetchone()
+        return row and row[0]
+
+    def is_unchanged(self, certificate, last_modified):
+        # Without both keys there is nothing to compare against, so the project has to be fetched.
+        if not certificate or not last_modified:
+            return False
+        return self.get_last_modified(certificate) == last_modified
+
+    def update_many(self, projects):
+        now = time.time()
+        rows = [(certificate, last_modified, now) for certificate, last_modified in projects
+                if certificate and last_modified]
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO projects (certificate, last_modified, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(certificate) DO UPDATE SET "
+                "last_modified = excluded.last_modified, updated_at = excluded.updated_at",
+                rows
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
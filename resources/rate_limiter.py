@@ -0,0 +1,80 @@
+import threading
+import time
+import urllib.parse
+
+
+class HostBucket(object):
+    __slots__ = ('rate', 'tokens', 'updated', 'last_decrease')
+
+    def __init__(self, rate, tokens):
+        self.rate = rate
+        self.tokens = tokens
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+
+
+class AdaptiveRateLimiter(object):
+    # Rates are in requests per second, per host.
+    initial_rate = 4.0
+    min_rate = 0.5
+    max_rate = 40.0
+    burst = 4
+    # AIMD: roughly +increase_step req/s for every second of healthy traffic, *decrease_factor on congestion.
+    increase_step = 1.0
+    decrease_factor = 0.5
+    # A single burst of failures should only halve the rate once.
+    decrease_cooldown = 2.0
+    latency_target = 3.0
+    throttled_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Unknown rate limiter setting '{name}'")
+            setattr(self, name, value)
+
+        self.buckets = dict()
+        self.lock = threading.Lock()
+
+    def get_bucket(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = HostBucket(self.initial_rate, self.burst)
+        return bucket
+
+    def reserve(self, url):
+        # Takes a token and returns how long the caller has to wait before using it.
+        with self.lock:
+            bucket = self.get_bucket(url)
+            now = time.monotonic()
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+
+            if bucket.tokens >= 0:
+                return 0.0
+            return -bucket.tokens / bucket.rate
+
+    def acquire(self, url):
+        delay = self.reserve(url)
+        if delay:
+            time.sleep(delay)
+
+    def record(self, url, latency=None, status_code=None, error=False):
+        congested = error or status_code in self.throttled_statuses or \
+            (latency is not None and latency > self.latency_target)
+
+        with self.lock:
+            bucket = self.get_bucket(url)
+            if congested:
+                now = time.monotonic()
+                if now - bucket.last_decrease >= self.decrease_cooldown:
+                    bucket.rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+                    bucket.last_decrease = now
+            else:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase_step / bucket.rate)
+
+    def get_rate(self, url):
+        with self.lock:
+            return self.get_bucket(url).rate
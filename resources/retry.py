@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy(object):
+    base_delay = 1
+    max_delay = 60
+    multiplier = 2
+    max_retry_after = 300
+    retry_statuses = (429, 500, 502, 503, 504)
+    # Retries allowed for a single request, per error class.
+    error_budgets = {
+        "timeout": 5,
+        "connection": 8,
+        "status": 6,
+    }
+    # Retries allowed across the whole crawl before every request fails fast.
+    crawl_budget = 1000
+
+    def __init__(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Unknown retry setting '{name}'")
+            setattr(self, name, value)
+
+        self.crawl_retries = 0
+        self.lock = threading.Lock()
+
+    def start(self, number_retries=None):
+        return RetryState(self, number_retries)
+
+    def backoff(self, attempt):
+        # Full jitter: anywhere between 0 and the exponential ceiling.
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return random.uniform(0, ceiling)
+
+    def retry_after(self, response):
+        value = response.headers.get("Retry-After") if response is not None else None
+        if not value:
+            return None
+
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+
+        return min(max(delay, 0), self.max_retry_after)
+
+    def take_from_crawl_budget(self):
+        with self.lock:
+            if self.crawl_retries >= self.crawl_budget:
+                return False
+            self.crawl_retries += 1
+            return True
+
+    def should_retry_status(self, status_code):
+        return status_code in self.retry_statuses
+
+
+class RetryState(object):
+    # Retry bookkeeping for one logical request.
+    def __init__(self, policy, number_retries=None):
+        self.policy = policy
+        self.number_retries = number_retries
+        self.attempt = 0
+        self.counts = dict()
+
+    def next_delay(self, error_class, response=None):
+        count = self.counts.get(error_class, 0)
+        if count >= self.policy.error_budgets.get(error_class, 0):
+            return None
+        if self.number_retries is not None and self.attempt >= self.number_retries:
+            return None
+        if not self.policy.take_from_crawl_budget():
+            print("Crawl retry budget exhausted")
+            return None
+
+        self.counts[error_class] = count + 1
+        delay = self.policy.retry_after(response)
+        if delay is None:
+            delay = self.policy.backoff(self.attempt)
+        self.attempt += 1
+
+        return delay
@@ -0,0 +1,44 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class SessionPool(object):
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        # LIFO, so the most recently used session (with the warmest connections) goes out first.
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def checkout(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                return self.factory()
+
+        return self.idle.get()
+
+    def checkin(self, pooled_session):
+        self.idle.put(pooled_session)
+
+    @contextmanager
+    def borrow(self):
+        pooled_session = self.checkout()
+        try:
+            yield pooled_session
+        finally:
+            self.checkin(pooled_session)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
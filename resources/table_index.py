@@ -0,0 +1,66 @@
+from resources.label_index import LabelIndex, normalize_space
+
+
+class Table(object):
+    # A header row (a <tr> with <th> cells) and the <td> texts of every <tr> sibling after it.
+    __slots__ = ('headers', 'rows')
+
+    def __init__(self, headers, rows):
+        self.headers = headers
+        self.rows = rows
+
+
+class TableIndex(object):
+    # One walk over every <tr> of the details page. Header cells map to (table, column index),
+    # plain cells map to the row they sit in, so the extractors never search the DOM again.
+    def __init__(self, tree):
+        # normalized <th> text -> [(Table, column index)], in document order
+        self.header_columns = dict()
+        # normalized <td> text -> [(row cells, cell index)], in document order
+        self.cell_positions = dict()
+
+        # <tr> -> its <td> texts, <td> -> its index among them
+        row_cells = dict()
+        cell_index = dict()
+        rows_by_parent = dict()
+        header_rows = []
+        # A single walk over rows and cells, so cells of nested tables keep their place in document order,
+        # the order "//td[...]" returned them in.
+        for element in tree.iter("tr", "td"):
+            if element.tag == "tr":
+                tds = element.findall("td")
+                row_cells[element] = [td.text for td in tds]
+                cell_index.update((td, idx) for idx, td in enumerate(tds))
+                rows_by_parent.setdefault(element.getparent(), []).append(element)
+
+                th_list = element.findall("th")
+                if th_list:
+                    header_rows.append((element, th_list))
+            elif element in cell_index:
+                cells = row_cells[element.getparent()]
+                for text in LabelIndex.iter_text_nodes(element):
+                    self.cell_positions.setdefault(normalize_space(text), []).append((cells, cell_index[element]))
+
+        # Header rows are in the same order as "//th[...]", each table holds the rows after its header row.
+        for tr, th_list in header_rows:
+            trs = rows_by_parent[tr.getparent()]
+            headers = [normalize_space("".join(LabelIndex.iter_text_nodes(th))) for th in th_list]
+            table = Table(headers, [row_cells[row] for row in trs[trs.index(tr) + 1:]])
+
+            for idx, th in enumerate(th_list):
+                for text in LabelIndex.iter_text_nodes(th):
+                    self.header_columns.setdefault(normalize_space(text), []).append((table, idx))
+
+    def columns(self, header):
+        return self.header_columns.get(header, [])
+
+    def cells(self, text):
+        return self.cell_positions.get(text, [])
+
+    def iter_rows(self, header, *columns):
+        # Yields one tuple per row under every "header" column. Each column is an (offset, converter)
+        # pair, the offset being relative to the header's column index. A None converter yields the raw text.
+        for table, idx in self.columns(header):
+            for row in table.rows:
+                yield tuple(converter(row[idx + offset]) if converter else row[idx + offset]
+                            for offset, converter in columns)
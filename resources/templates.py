@@ -1,3 +1,6 @@
+from collections.abc import MutableMapping
+
+
 class AutoCompleteDict(dict):
     def __getattr__(self, name):
         if name in self:
@@ -124,7 +127,66 @@ def projects_data_template():
         "form_4": "",
         "conveyance": "",
         "complaint_details":"",
-        "litigation_details":""
+        "litigation_details":"",
+        "Total Plots": "",
+        "Total Area of All Plots": "",
+        "Plots 0-100": "",
+        "Plots 100-200": "",
+        "Plots 200-300": "",
+        "Plots 300-500": "",
+        "Plots 500-1000": "",
+        "Plots 1000+": ""
     }
 
     return data
+
+
+def projects_data_fields():
+    # The one column order every output is written in.
+    return list(projects_data_template())
+
+
+class ProjectRecord(MutableMapping):
+    # One project, its values kept in a list in projects_data_template() order instead of a dict per row.
+    # The keys are fixed: every template field is always present and no other field can be added.
+    __slots__ = ('data',)
+
+    fields = tuple(projects_data_template())
+    field_index = {field: i for i, field in enumerate(fields)}
+    defaults = tuple(projects_data_template().values())
+
+    def __init__(self, *args, **kwargs):
+        self.data = list(self.defaults)
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self.data[self.field_index[key]]
+
+    def __setitem__(self, key, value):
+        self.data[self.field_index[key]] = value
+
+    def __delitem__(self, key):
+        raise TypeError(f"'{self.__class__.__name__}' fields cannot be removed")
+
+    def __contains__(self, key):
+        return key in self.field_index
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __getstate__(self):
+        return self.data
+
+    def __setstate__(self, data):
+        self.data = data
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self.items())!r})"
+
+    def copy(self):
+        record = self.__class__.__new__(self.__class__)
+        record.data = list(self.data)
+        return record
@@ -1,20 +1,64 @@
-import base64
-import csv
 import io
 import json
+import multiprocessing
+import os
 import re
+import socket
+import sqlite3
+import threading
 import time
 import urllib.parse
-
-from requests import Timeout
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
 from resources.base import BaseVerifier
+from resources.base64_stream import Base64StreamDecoder
+from resources.cache import ResponseCache
+from resources.certificate_store import CertificateStore
+from resources.coordinator import Coordinator, CoordinatorClient
+from resources.exceptions import VerifierRequestException
+from resources.journal import ProjectJournal
+from resources.label_index import LabelIndex
+from resources.parsers import ParsePool, parse_certificate_date, parse_view_details
+from resources.project_index import ProjectIndex
+from resources.table_index import TableIndex
+import resources.base64_stream as base64_stream
+import resources.numeric as numeric
 import resources.templates as templates
+import resources.xpaths as xpaths
+from resources.work_queue import WorkQueue
+from resources.writers import CsvWriter, ParquetWriter, SqliteWriter
+import numpy as np
 import PyPDF2
 from tqdm import tqdm
 import warnings
 warnings.filterwarnings("ignore")
 
+# Apartment type -> bucket, checked in this order (the first pattern found anywhere in the string wins).
+APARTMENT_TYPE_PATTERNS = (
+    ("1rk", r"1RK|STUDIO"),
+    ("1bhk", r"1(?:BHK|RHK|RLK)"),
+    ("2bhk", r"(?:2|1.5)(?:BHK|RHK|RLK)"),
+    ("3bhk", r"(?:3|2.5)(?:BHK|RHK|RLK)"),
+    ("4bhk", r"(?:4|3.5)(?:BHK|RHK|RLK)"),
+    ("5bhk", r"(?:5|4.5)(?:BHK|RHK|RLK)"),
+    ("shops", r"SHOP"),
+    ("bungalow", r"BUNGALOW"),
+    ("office_space", r"OFFICE"),
+)
+
+# One alternation of lookaheads: branches are tried in order, each scanning the whole string, so a single
+# match() gives the same answer as the old chain of re.search calls. Every branch ends in one empty group,
+# so match.lastindex is the number of the pattern that hit. Only the scan crosses newlines, the '.' in
+# 1.5/2.5/... keeps its usual meaning.
+APARTMENT_TYPE_RE = re.compile(
+    "|".join(f"(?=(?s:.*?)(?:{pattern}))()" for _, pattern in APARTMENT_TYPE_PATTERNS),
+    re.IGNORECASE
+)
+
+CERTIFICATE_DATE_RE = re.compile("commencing from {2}([0-9/]+) {2}and ending")
+
+
 class MahareraitVerifier(BaseVerifier):
     headers = {
         'authority': 'maharerait.mahaonline.gov.in',
@@ -35,49 +79,126 @@ class MahareraitVerifier(BaseVerifier):
     max_retries = 10
     retry_delay = 5
     current_retries = 0
+    concurrent_workers = 8
+    # Details pages and certificates are parsed in this many processes (0 parses on the fetching thread),
+    # with at most parse_queue_size payloads waiting for a parser.
+    parse_processes = os.cpu_count() or 1
+    parse_queue_size = 64
+    response_cache = ResponseCache('http_cache')
+    # Incremental mode only fetches projects whose listing "Last Modified Date" changed since the last crawl.
+    incremental = False
+    project_index_path = 'project_index.sqlite3'
+    # Certificate number -> "Certificate Date" (and optionally the PDF) so certificates are only parsed once.
+    certificate_store_path = 'certificates.sqlite3'
+    store_certificate_pdfs = False
+    # Streamed certificates are decoded chunk by chunk into the PDF, never holding the base64 text in memory.
+    stream_certificates = False
+    certificate_chunk_size = 64 * 1024
+    # Output, rows are buffered and written every csv_flush_rows rows or csv_flush_interval seconds.
+    csv_path = 'rera_data.csv'
+    csv_flush_rows = 500
+    csv_flush_interval = 30
+    # Optional typed Parquet copy of the output (needs pyarrow), written in row groups of parquet_row_group_size.
+    # parquet_path is a dataset directory, every run adds its own part file to it.
+    parquet_path = None
+    parquet_row_group_size = 10000
+    # Optional SQLite copy with one row per certificate number, upserted in batches of sqlite_batch_rows.
+    sqlite_path = None
+    sqlite_batch_rows = 1000
+    # Every finished project is journaled, so a crawl resumes exactly where it stopped (None disables it).
+    # A Parquet part cannot be brought back in line with the journal, so parquet_path needs journal_path = None.
+    journal_path = 'journal.jsonl'
+    journal_compact_every = 1000
+    # Queue mode (fetch_data_queued): listing pages and projects are tasks in a SQLite queue drained by
+    # several worker processes, a task failing work_queue_max_attempts times goes to the dead letters.
+    work_queue_path = 'work_queue.sqlite3'
+    work_queue_lease = 300
+    work_queue_max_attempts = 5
+    work_queue_processes = 4
+    # Distributed mode (serve_coordinator / run_shard_worker): workers lease shards of shard_pages listing pages.
+    coordinator_host = '127.0.0.1'
+    coordinator_port = 8780
+    # Its own queue, so shards and the queue mode's page/project tasks never meet.
+    coordinator_queue_path = 'coordinator_queue.sqlite3'
+    shard_pages = 10
+    # The coordinator gives up once no worker has contacted it for this many seconds with shards still left.
+    coordinator_worker_timeout = 600
+
+    # (field, label on the details page, section heading) for every plain label/value field.
+    view_details_labels = (
+        ("Do you have any Past Experience ?", "Do you have any Past Experience ?", None),
+        ("Pin Code", "Pin Code", None),
+        ("Office Number", "Office Number", None),
+        ("Website URL", "Website URL", None),
+        ("Project Status", "Project Status", "Project"),
+        ("Proposed Date of Completion", "Proposed Date of Completion", "Project"),
+        ("Revised Proposed Date of Completion", "Revised Proposed Date of Completion", "Project"),
+        ("Litigations related to the project ?", "Litigations related to the project ?", "Project"),
+        ("Project Type", "Project Type", "Project"),
+        ("Are there any Promoter(Land Owner/ Investor)",
+         "Are there any Promoter(Land Owner/ Investor) (as defined by MahaRERA Order) in the project ?", "Project"),
+        ("Division", "Division", "Project"),
+        ("District", "District", "Project"),
+        ("Taluka", "Taluka", "Project"),
+        ("Village", "Village", "Project"),
+        ("Street Pin Code", "Pin Code", "Project"),
+        ("Total Plot/Project area (sqmts)", "Total Plot/Project area (sqmts)", "Project"),
+        ("Total Number of Proposed Building/Wings (In the Layout/Plot)",
+         "Total Number of Proposed Building/Wings (In the Layout/Plot)", "Project"),
+        ("Total Recreational Open Space as Per Sanctioned Plan",
+         "Total Recreational Open Space as Per Sanctioned Plan", "Project"),
+        ("Sanctioned FSI of the project applied for registration (Sanctioned Built-up Area)",
+         "Sanctioned FSI of the project applied for registration (Sanctioned Built-up Area)", "FSI Details"),
+        ("Built-up-Area as per Proposed FSI (In sqmts) ( Proposed but not sanctioned) "
+         "(As soon as approved, should be immediately updated in Approved FSI)",
+         "Built-up-Area as per Proposed FSI (In sqmts) ( Proposed but not sanctioned) "
+         "(As soon as approved, should be immediately updated in Approved FSI)", "FSI Details"),
+        ("Permissible Total FSI of Plot (Permissible Built-up Area)",
+         "Permissible Total FSI of Plot (Permissible Built-up Area)", "FSI Details"),
+        ("Bank Name", "Bank Name", "Bank Details"),
+        ("IFSC Code", "IFSC Code", "Bank Details"),
+    )
+
+    # Upper edges of the carpet area (sqmts) histogram, the last bucket is everything above 200.
+    carpet_area_edges = np.array([30, 45, 60, 90, 120, 150, 200], dtype=float)
+    carpet_area_buckets = ("0_30", "30_45", "45_60", "60_90", "90_120", "120_150", "150_200", "more_than_200")
+    apartment_type_buckets = ("1rk", "1bhk", "2bhk", "3bhk", "4bhk", "5bhk", "shops", "bungalow", "office_space",
+                              "others")
+    apartment_type_index = dict(zip(apartment_type_buckets, range(len(apartment_type_buckets))))
+    plot_area_edges = np.array([100, 200, 300, 500, 1000], dtype=float)
+    plot_area_buckets = ("0-100", "100-200", "200-300", "300-500", "500-1000", "1000+")
 
     def __init__(self, to_verify):
         super().__init__(to_verify)
         self.token = None
         self.user_id = None
         self.count = 0
+        self.executor = None
+        self.parse_pool = None
+        self.project_index = None
+        self.certificate_store = None
+        self.writers = None
+        self.csv_writer = None
+        self.journal = None
+        self.work_queue = None
+        self.stores_lock = threading.Lock()
 
     def smart_request(self, type_of_request, url, **kwargs):
-        count = 0
-        number_retries = kwargs.pop('number_retries', None)
-        updated_kwargs = {**self.timeout_setting, **kwargs}
-        if number_retries is None:
-            number_retries = self.number_retries
-        while count < number_retries:
-            try:
-                if type_of_request == 'GET':
-                    response = self.session.get(url, **updated_kwargs)
-                elif type_of_request == 'POST':
-                    response = self.session.post(url, **updated_kwargs)
-                else:
-                    response = self.session.request(type_of_request, url, **updated_kwargs)
-                return response
-            except Timeout:
-                count += 1
-                print('Timeout Happened, Retrying after 60 seconds')
-                time.sleep(60)
-                continue
-            except ConnectionError as e:
-                print(e)
-                count += 0.1
-                print('Timeout Happened, Retrying after 60 seconds')
-                time.sleep(60)
-                continue
-        else:
+        try:
+            return super().smart_request(type_of_request, url, **kwargs)
+        except VerifierRequestException:
             return None
 
     def pre_query(self, *args, **kwargs):
+        self.token = self.get_token()
+        return self.search_query()
+
+    def get_token(self):
         resp = self.smart_request("GET", self.pre_query_url, headers=self.headers, verify=False)
 
         hidden_payload = self.get_hidden_payload(resp)
 
-        self.token = hidden_payload.get('__RequestVerificationToken')
-        return self.search_query()
+        return hidden_payload.get('__RequestVerificationToken')
 
     def get_districts(self):
         payload = {"DivID": self.maharashtra_state_id}  # State id of maharashtra hardcoded.
@@ -87,6 +208,14 @@ class MahareraitVerifier(BaseVerifier):
 
         return districts
 
+    @staticmethod
+    def filter_districts(all_districts, districts=None):
+        if not districts:
+            return all_districts
+
+        wanted = {district.upper() for district in districts}
+        return [district for district in all_districts if district.get("Text").upper() in wanted]
+
     def get_talukas(self, dis_id):
         payload = {"DisID": dis_id}
 
@@ -98,340 +227,111 @@ class MahareraitVerifier(BaseVerifier):
     def show_certificate(self, qstr):
         payload = {"ID": qstr}
 
+        if self.stream_certificates:
+            return self.stream_certificate(payload)
+
         resp = self.smart_request("POST", self.show_certificate_url, headers=self.headers, data=payload, verify=False)
-        certificate_data = resp.text
+        # The raw base64 bytes, decoding them to str first would only add a copy.
+        certificate_data = resp.content
 
         return certificate_data
 
-    def view_details_query(self, url):
-        resp = self.smart_request("GET", url, headers=self.headers, verify=False)
-        return self.extract_view_details_data(resp)
-
-    @staticmethod
-    def extract_view_details_label(tree, label, heading=None):
-        label_re = f"//label[text()[normalize-space() = '{label}']]/../following-sibling::div[1]"
-        label_second_re = f"//*[text()[normalize-space() = '{label}']]/following-sibling::div[1]"
-
-        if heading:
-            label_re = f"//*[text()[normalize-space() = '{heading}']]/../following-sibling::div//label[text()[normalize-space() = '{label}']]/../following-sibling::div[1]"
-            label_second_re = f"//*[text()[normalize-space() = '{heading}']]/../following-sibling::div//*[text()[normalize-space() = '{label}']]/following-sibling::div[1]"
-
+    def stream_certificate(self, payload):
+        resp = self.smart_request("POST", self.show_certificate_url, headers=self.headers, data=payload, verify=False,
+                                  stream=True)
+        decoder = Base64StreamDecoder(io.BytesIO())
         try:
-            label_match = tree.xpath(label_re)
+            for chunk in resp.iter_content(self.certificate_chunk_size):
+                decoder.feed(chunk)
+        finally:
+            resp.close()
 
-            if not len(label_match):
-                label_match = tree.xpath(label_second_re)
+        return decoder.close()
 
-            label_data = len(label_match) and label_match[0].text or ""
-
-        except Exception as exc:
-            print(f"Could not find {label}", exc)
-            return ""
+    def view_details_query(self, url, project_data=None):
+        return self.submit_parse(parse_view_details, self.view_details_content(url), project_data).result()
 
-        label_data = label_data.replace("\r\n", "").strip()
-
-        return label_data
+    def view_details_content(self, url):
+        resp = self.smart_request("GET", url, headers=self.headers, verify=False)
+        return resp.content
 
-    def extract_view_details_data(self, response):
+    def extract_view_details_data(self, response, project_data=None):
+        # Fields are written straight into the project's record, a fresh one when none is given.
         tree = self.get_etree(response)
-        project_data = dict()
-
-        project_data["Do you have any Past Experience ?"] = self.extract_view_details_label(
-            tree,
-            "Do you have any Past Experience ?",
-        )
-
-        project_data["Pin Code"] = self.extract_view_details_label(
-            tree,
-            "Pin Code",
-        )
-
-        project_data["Office Number"] = self.extract_view_details_label(
-            tree,
-            "Office Number",
-        )
+        if project_data is None:
+            project_data = templates.ProjectRecord()
 
-        project_data["Website URL"] = self.extract_view_details_label(
+        label_index = LabelIndex(
             tree,
-            "Website URL",
+            {label for _, label, _ in self.view_details_labels},
+            {heading for _, _, heading in self.view_details_labels if heading}
         )
 
-        project_data["Project Status"] = self.extract_view_details_label(
-            tree,
-            "Project Status",
-            "Project"
-        )
+        for field, label, heading in self.view_details_labels:
+            project_data[field] = label_index.get(label, heading)
 
-        project_data["Proposed Date of Completion"] = self.extract_view_details_label(
-            tree,
-            "Proposed Date of Completion",
-            "Project"
-        )
+        project_data["Revised Proposed Date of Completion"] = \
+            project_data["Revised Proposed Date of Completion"] or project_data["Proposed Date of Completion"]
 
-        project_data["Revised Proposed Date of Completion"] = self.extract_view_details_label(
-            tree,
-            "Revised Proposed Date of Completion",
-            "Project"
-        ) or project_data["Proposed Date of Completion"]
+        project_data["Total Number of Proposed Building/Wings (In the Layout/Plot)"] = self.safe_int(
+            project_data["Total Number of Proposed Building/Wings (In the Layout/Plot)"])
 
-        project_data["Litigations related to the project ?"] = self.extract_view_details_label(
-            tree,
-            "Litigations related to the project ?",
-            "Project"
-        )
-        project_data["Project Type"] = self.extract_view_details_label(
-            tree,
-            "Project Type",
-            "Project"
-        )
-
-        project_data["Are there any Promoter(Land Owner/ Investor)"] = self.extract_view_details_label(
-            tree,
-            "Are there any Promoter(Land Owner/ Investor) (as defined by MahaRERA Order) in the project ?",
-            "Project"
-        )
-
-        project_data["Division"] = self.extract_view_details_label(
-            tree,
-            "Division",
-            "Project"
-        )
-
-        project_data["District"] = self.extract_view_details_label(
-            tree,
-            "District",
-            "Project"
-        )
-
-        project_data["Taluka"] = self.extract_view_details_label(
-            tree,
-            "Taluka",
-            "Project"
-        )
-
-        project_data["Village"] = self.extract_view_details_label(
-            tree,
-            "Village",
-            "Project"
-        )
-
-        project_data["Street Pin Code"] = self.extract_view_details_label(
-            tree,
-            "Pin Code",
-            "Project"
-        )
-
-        project_data["Total Plot/Project area (sqmts)"] = self.extract_view_details_label(
-            tree,
-            "Total Plot/Project area (sqmts)",
-            "Project"
-        )
-
-        project_data[
-            "Total Number of Proposed Building/Wings (In the Layout/Plot)"] = self.safe_int(
-            self.extract_view_details_label(
-                tree,
-                "Total Number of Proposed Building/Wings (In the Layout/Plot)",
-                "Project"
-            ))
-
-        project_data["Total Recreational Open Space as Per Sanctioned Plan"] = self.extract_view_details_label(
-            tree,
-            "Total Recreational Open Space as Per Sanctioned Plan",
-            "Project"
-        )
-
-        project_data[
-            "Sanctioned FSI of the project applied for registration (Sanctioned Built-up Area)"] = \
-            self.extract_view_details_label(
-                tree,
-                "Sanctioned FSI of the project applied for registration (Sanctioned Built-up Area)",
-                "FSI Details"
-            )
-
-        project_data[
-            "Built-up-Area as per Proposed FSI (In sqmts) ( Proposed but not sanctioned) "
-            "(As soon as approved, should be immediately updated in Approved FSI)"] = \
-            self.extract_view_details_label(
-                tree,
-                "Built-up-Area as per Proposed FSI (In sqmts) ( Proposed but not sanctioned) "
-                "(As soon as approved, should be immediately updated in Approved FSI)",
-                "FSI Details"
-            )
-
-        project_data["Permissible Total FSI of Plot (Permissible Built-up Area)"] = self.extract_view_details_label(
-            tree,
-            "Permissible Total FSI of Plot (Permissible Built-up Area)",
-            "FSI Details"
-        )
-
-        project_data["Bank Name"] = self.extract_view_details_label(tree, "Bank Name", "Bank Details")
-
-        project_data["IFSC Code"] = self.extract_view_details_label(
-            tree,
-            "IFSC Code",
-            "Bank Details"
-        )
+        table_index = TableIndex(tree)
 
         try:
-            community_buildings_available = tree.xpath(
-                "//td[text()[normalize-space() = 'Community Buildings :']]/../td[2]")[0].text.replace("\r\n",
-                                                                                                      "").replace(" ",
-                                                                                                                  "")
+            community_buildings_cells, _ = table_index.cells("Community Buildings :")[0]
+
+            community_buildings_available = community_buildings_cells[1].replace("\r\n", "").replace(" ", "")
 
             project_data["Community Buildings Available"] = community_buildings_available
 
-            community_buildings_percent = tree.xpath(
-                "//td[text()[normalize-space() = 'Community Buildings :']]/../td[3]")[0].text.replace("\r\n",
-                                                                                                      "").replace(" ",
-                                                                                                                  "")
+            community_buildings_percent = community_buildings_cells[2].replace("\r\n", "").replace(" ", "")
 
             project_data["Community Buildings Percent"] = community_buildings_percent
         except Exception as exc:
             print("Exception while fetching Community data", exc)
 
-        project_data["Number of Sanctioned Floors"] = self.extract_building_details(tree, "Number of Sanctioned Floors")
+        project_data["Number of Sanctioned Floors"] = self.extract_building_details(table_index, "Number of Sanctioned Floors")
 
         project_data["Total no. of open Parking as per Sanctioned Plan (4-wheeler+2-Wheeler)"] = \
-            self.extract_building_details(tree,
+            self.extract_building_details(table_index,
                                           "Total no. of open Parking as per Sanctioned Plan (4-wheeler+2-Wheeler)")
 
         project_data["Number of Closed Parking"] = \
-            self.extract_building_details(tree, "Number of Closed Parking")
+            self.extract_building_details(table_index, "Number of Closed Parking")
 
         try:
-            carpet_area_range = {
-                "carpet_area_apartments_0_30": 0,
-                "carpet_area_booked_apartments_0_30": 0,
-                "carpet_area_apartments_30_45": 0,
-                "carpet_area_booked_apartments_30_45": 0,
-                "carpet_area_apartments_45_60": 0,
-                "carpet_area_booked_apartments_45_60": 0,
-                "carpet_area_apartments_60_90": 0,
-                "carpet_area_booked_apartments_60_90": 0,
-                "carpet_area_apartments_90_120": 0,
-                "carpet_area_booked_apartments_90_120": 0,
-                "carpet_area_apartments_120_150": 0,
-                "carpet_area_booked_apartments_120_150": 0,
-                "carpet_area_apartments_150_200": 0,
-                "carpet_area_booked_apartments_150_200": 0,
-                "carpet_area_apartments_more_than_200": 0,
-                "carpet_area_booked_apartments_more_than_200": 0,
-                "apartments_1rk": 0,
-                "booked_apartments_1rk": 0,
-                "apartments_1bhk": 0,
-                "booked_apartments_1bhk": 0,
-                "apartments_2bhk": 0,
-                "booked_apartments_2bhk": 0,
-                "apartments_3bhk": 0,
-                "booked_apartments_3bhk": 0,
-                "apartments_4bhk": 0,
-                "booked_apartments_4bhk": 0,
-                "apartments_5bhk": 0,
-                "booked_apartments_5bhk": 0,
-                "apartments_shops": 0,
-                "booked_apartments_shops": 0,
-                "apartments_bungalow": 0,
-                "booked_apartments_bungalow": 0,
-                "apartments_office_space": 0,
-                "booked_apartments_office_space": 0,
-                "apartments_others": 0,
-                "booked_apartments_others": 0,
-            }
-
-            carpet_area_th_arr = tree.xpath("//th[text()[normalize-space() = 'Carpet Area (in Sqmts)']]")
-
-            carpet_area_arr = []
-            total_no_of_apartment = 0
-            total_no_of_booked_apartment = 0
-
-            for carpet_area_th in carpet_area_th_arr:
-                carpet_area_th_list = carpet_area_th.findall("../th")
-                carpet_area_th_idx = carpet_area_th_list.index(carpet_area_th)
-
-                carpet_area_rows = list(carpet_area_th.getparent().itersiblings("tr"))
-
-                for row in carpet_area_rows:
-                    carpet_areas = self.safe_float(row.findall("td")[carpet_area_th_idx].text)
-                    apartment_type = str(row.findall("td")[carpet_area_th_idx - 1].text).replace(" ", "").upper()
-                    no_of_apartment = self.safe_float(row.findall("td")[carpet_area_th_idx + 1].text)
-                    no_of_booked_apartment = self.safe_float(row.findall("td")[carpet_area_th_idx + 2].text)
-
-                    total_no_of_apartment += no_of_apartment
-                    total_no_of_booked_apartment += no_of_booked_apartment
-
-                    if self.regex_match(r'(1(RK))|(STUDIO)', apartment_type):
-                        carpet_area_range["apartments_1rk"] += no_of_apartment
-                        carpet_area_range["booked_apartments_1rk"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'1(BHK|RHK|RLK)', apartment_type):
-                        carpet_area_range["apartments_1bhk"] += no_of_apartment
-                        carpet_area_range["booked_apartments_1bhk"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'(2|1.5)(BHK|RHK|RLK)', apartment_type):
-                        carpet_area_range["apartments_2bhk"] += no_of_apartment
-                        carpet_area_range["booked_apartments_2bhk"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'(3|2.5)(BHK|RHK|RLK)', apartment_type):
-                        carpet_area_range["apartments_3bhk"] += no_of_apartment
-                        carpet_area_range["booked_apartments_3bhk"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'(4|3.5)(BHK|RHK|RLK)', apartment_type):
-                        carpet_area_range["apartments_4bhk"] += no_of_apartment
-                        carpet_area_range["booked_apartments_4bhk"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'(5|4.5)(BHK|RHK|RLK)', apartment_type):
-                        carpet_area_range["apartments_5bhk"] += no_of_apartment
-                        carpet_area_range["booked_apartments_5bhk"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'SHOP', apartment_type):
-                        carpet_area_range["apartments_shops"] += no_of_apartment
-                        carpet_area_range["booked_apartments_shops"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'BUNGALOW', apartment_type):
-                        carpet_area_range["apartments_bungalow"] += no_of_apartment
-                        carpet_area_range["booked_apartments_bungalow"] += no_of_booked_apartment
-
-                    elif self.regex_match(r'OFFICE', apartment_type):
-                        carpet_area_range["apartments_office_space"] += no_of_apartment
-                        carpet_area_range["booked_apartments_office_space"] += no_of_booked_apartment
-
-                    else:
-                        carpet_area_range["apartments_others"] += no_of_apartment
-                        carpet_area_range["booked_apartments_others"] += no_of_booked_apartment
-
-                    if 0 <= carpet_areas <= 30:
-                        carpet_area_range["carpet_area_apartments_0_30"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_0_30"] += no_of_booked_apartment
-                    elif 30 < carpet_areas <= 45:
-                        carpet_area_range["carpet_area_apartments_30_45"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_30_45"] += no_of_booked_apartment
-                    elif 45 < carpet_areas <= 60:
-                        carpet_area_range["carpet_area_apartments_45_60"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_45_60"] += no_of_booked_apartment
-                    elif 60 < carpet_areas <= 90:
-                        carpet_area_range["carpet_area_apartments_60_90"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_60_90"] += no_of_booked_apartment
-                    elif 90 < carpet_areas <= 120:
-                        carpet_area_range["carpet_area_apartments_90_120"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_90_120"] += no_of_booked_apartment
-                    elif 120 < carpet_areas <= 150:
-                        carpet_area_range["carpet_area_apartments_120_150"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_120_150"] += no_of_booked_apartment
-                    elif 150 < carpet_areas <= 200:
-                        carpet_area_range["carpet_area_apartments_150_200"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_150_200"] += no_of_booked_apartment
-                    else:
-                        carpet_area_range["carpet_area_apartments_more_than_200"] += no_of_apartment
-                        carpet_area_range["carpet_area_booked_apartments_more_than_200"] += no_of_booked_apartment
-
-                    carpet_area_arr.append(carpet_areas * no_of_apartment)
-
-            project_data.update(carpet_area_range)
-
-            project_data["Carpet Area (in Sqmts)"] = sum(carpet_area_arr)
-            project_data["Number of Apartment"] = total_no_of_apartment
-            project_data["Number of Booked Apartment"] = total_no_of_booked_apartment
+            carpet_area_rows = list(table_index.iter_rows(
+                "Carpet Area (in Sqmts)",
+                (0, None),
+                (-1, lambda value: str(value).replace(" ", "").upper()),
+                (1, None),
+                (2, None),
+            ))
+
+            carpet_areas = np.array(numeric.safe_float_column(row[0] for row in carpet_area_rows), dtype=float)
+            no_of_apartments = np.array(numeric.safe_float_column(row[2] for row in carpet_area_rows), dtype=float)
+            no_of_booked_apartments = np.array(numeric.safe_float_column(row[3] for row in carpet_area_rows),
+                                               dtype=float)
+
+            # Bucket i holds edges[i - 1] < area <= edges[i], negative areas fall into the last bucket like before.
+            area_idx = np.searchsorted(self.carpet_area_edges, carpet_areas, side="left")
+            area_idx[carpet_areas < 0] = len(self.carpet_area_buckets) - 1
+
+            type_idx = np.array([self.apartment_type_index[self.classify_apartment_type(row[1])]
+                                 for row in carpet_area_rows], dtype=int)
+
+            for bucket_idx, buckets, apartments_key, booked_key in (
+                    (area_idx, self.carpet_area_buckets,
+                     "carpet_area_apartments_{}", "carpet_area_booked_apartments_{}"),
+                    (type_idx, self.apartment_type_buckets, "apartments_{}", "booked_apartments_{}"),
+            ):
+                self.bucket_sums(project_data, bucket_idx, buckets, apartments_key, no_of_apartments)
+                self.bucket_sums(project_data, bucket_idx, buckets, booked_key, no_of_booked_apartments)
+
+            project_data["Carpet Area (in Sqmts)"] = sum((carpet_areas * no_of_apartments).tolist())
+            project_data["Number of Apartment"] = sum(no_of_apartments.tolist())
+            project_data["Number of Booked Apartment"] = sum(no_of_booked_apartments.tolist())
 
         except IndexError:
             print("Could not find carpet area data")
@@ -439,85 +339,38 @@ class MahareraitVerifier(BaseVerifier):
             print("Exception while fetching carpet area data", exc)
 
         try:
-            plots_range = {
-            "total_plots": " ",
-            "total_area_of_all_plots":" ",
-            "plots_0_100": " ",
-            "plots_100_200": " ",
-            "plots_200_300": " ",
-            "plots_300_500": " ",
-            "plots_500_1000": " ",
-            "plots_1000_plus": " "
-            }
-
-            number_of_plots_th_arr = tree.xpath("//th[text()[normalize-space() = 'Number of Plots']]")
-
-            total_plots = 0
-            total_area_of_all_plots = 0
-            plots_0_100 = 0
-            plots_100_200 = 0
-            plots_200_300 = 0
-            plots_300_500 = 0
-            plots_500_1000 = 0
-            plots_1000_plus = 0
-        
-            for number_of_plots_th in  number_of_plots_th_arr:
-                number_of_plots_th_list = number_of_plots_th.findall("../th")
-                number_of_plots_th_idx = number_of_plots_th_list.index(number_of_plots_th)
-                
-                number_of_plots_rows = list(number_of_plots_th.getparent().itersiblings("tr"))
-
-                for row in number_of_plots_rows:
-                    
-                    number_of_plots = self.safe_float(row.findall("td")[number_of_plots_th_idx].text)
-                    area_of_plots = self.safe_float(row.findall("td")[number_of_plots_th_idx + 1].text)
-                    # print(number_of_plots)
-                    # print(area_of_plots)
-                  
-                        
-                    total_plots += number_of_plots
-                    total_area_of_all_plots += number_of_plots*area_of_plots
-                    if area_of_plots < 100.0:
-                        plots_0_100 += number_of_plots
-                    elif 100.0 <= area_of_plots < 200.0:
-                        plots_100_200 += number_of_plots
-                    elif 200.0 <= area_of_plots < 300.0:
-                        plots_200_300 += number_of_plots
-                    elif 300.0 <= area_of_plots < 500.0:
-                        plots_300_500 += number_of_plots
-                    elif 500.0 <= area_of_plots < 1000.0:
-                        plots_500_1000 += number_of_plots
-                    else:
-                        plots_1000_plus += number_of_plots
-               
-            
-
-     
-            project_data["Total Plots"] = total_plots
-            project_data["Total Area of All Plots"] = total_area_of_all_plots
-            project_data["Plots 0-100"] = plots_0_100
-            project_data["Plots 100-200"] = plots_100_200
-            project_data["Plots 200-300"] = plots_200_300
-            project_data["Plots 300-500"] = plots_300_500
-            project_data["Plots 500-1000"] = plots_500_1000
-            project_data["Plots 1000+"] = plots_1000_plus
+            number_of_plots_rows = list(table_index.iter_rows(
+                "Number of Plots",
+                (0, None),
+                (1, None),
+            ))
+
+            number_of_plots = np.array(numeric.safe_float_column(row[0] for row in number_of_plots_rows), dtype=float)
+            area_of_plots = np.array(numeric.safe_float_column(row[1] for row in number_of_plots_rows), dtype=float)
+
+            # Bucket i holds edges[i - 1] <= area < edges[i].
+            plot_idx = np.searchsorted(self.plot_area_edges, area_of_plots, side="right")
+
+            project_data["Total Plots"] = sum(number_of_plots.tolist())
+            project_data["Total Area of All Plots"] = sum((number_of_plots * area_of_plots).tolist())
+            self.bucket_sums(project_data, plot_idx, self.plot_area_buckets, "Plots {}", number_of_plots)
 
         except IndexError:
             print("Could not find Plot Area data")
         except Exception as exc:
             print("Exception while fetching Plot Area data", exc)
 
-        project_data["Excavation"] = self.extract_building_tasks(tree, "Excavation") / (
+        project_data["Excavation"] = self.extract_building_tasks(table_index, "Excavation") / (
                 project_data["Total Number of Proposed Building/Wings (In the Layout/Plot)"] or 1)
 
         project_data["X number of Slabs of Super Structure"] = self.extract_building_tasks(
-            tree, "X number of Slabs of Super Structure"
+            table_index, "X number of Slabs of Super Structure"
         ) / (project_data["Total Number of Proposed Building/Wings (In the Layout/Plot)"] or 1)
 
         project_data[
             "Installation of lifts, water pumps, Fire Fighting Fittings and Equipment"] = \
             self.extract_building_tasks(
-                tree,
+                table_index,
                 "Installation of lifts, water pumps, "
                 "Fire Fighting Fittings and Equipment as per CFO NOC, "
                 "Electrical fittings to Common Areas, electro, mechanical equipment,"
@@ -527,44 +380,52 @@ class MahareraitVerifier(BaseVerifier):
                 "Compound Wall and all other requirements as may be required to Obtain Occupation /Completion Certificate"
             ) / (project_data["Total Number of Proposed Building/Wings (In the Layout/Plot)"] or 1)
 
-        form_4 = tree.xpath(
-            "//td/span[contains(text(), 'Certificates of Architect') or "
-            "contains(text(), 'Completion Certificate') or "
-            "contains(text(), 'certificate of completion') or "
-            "contains(text(), 'Certificate on Completion') or "
-            "contains(text(), 'Form 4')"
-            "]/../following-sibling::td/button")
+        form_4 = xpaths.form_4(tree)
 
         project_data["form_4"] = len(form_4) and "YES" or "NO"
 
-        status_of_conveyance = tree.xpath(
-            "//td/span[text()[normalize-space() = '1 Status of Conveyance']]/../following-sibling::td/button")
+        status_of_conveyance = xpaths.status_of_conveyance(tree)
 
         project_data["conveyance"] = len(status_of_conveyance) and "YES" or "NO"
-        if tree.xpath("//th[text()[normalize-space() = 'Complaint No']]"):
-            complaint_details_table = tree.xpath("//th[text()[normalize-space() = 'Complaint No']]")[0]
-            project_data["complaint_details"] = len(list(complaint_details_table.getparent().itersiblings("tr")))
+        complaint_details_columns = table_index.columns("Complaint No")
+        if complaint_details_columns:
+            complaint_details_table, _ = complaint_details_columns[0]
+            project_data["complaint_details"] = len(complaint_details_table.rows)
         else:
             project_data["complaint_details"] = 0
-        if tree.xpath("//th[text()[normalize-space() = 'Preventive/Injunction/Interim Order is Passed?']]"):
-            litigation_details_table = tree.xpath("//th[text()[normalize-space() = 'Preventive/Injunction/Interim Order is Passed?']]")[0]
-            project_data["litigation_details"] = len(list(litigation_details_table.getparent().itersiblings("tr")))
+        litigation_details_columns = table_index.columns("Preventive/Injunction/Interim Order is Passed?")
+        if litigation_details_columns:
+            litigation_details_table, _ = litigation_details_columns[0]
+            project_data["litigation_details"] = len(litigation_details_table.rows)
         else:
             project_data["litigation_details"] = 0
 
         return project_data
 
-    def extract_building_details(self, tree, key):
-        try:
-            th_arr = tree.xpath(f"//th[text()[normalize-space() = '{key}']]")
+    @staticmethod
+    def bucket_sums(data, bucket_idx, buckets, key, weights):
+        # Buckets without a single row keep their int 0, like the old if/elif accumulation did.
+        rows_per_bucket = np.bincount(bucket_idx, minlength=len(buckets))
+        sums = np.bincount(bucket_idx, weights=weights, minlength=len(buckets))
 
-            final_value = 0
+        for i, bucket in enumerate(buckets):
+            data[key.format(bucket)] = float(sums[i]) if rows_per_bucket[i] else 0
 
-            for th in th_arr:
-                th_list = th.findall("../th")
-                th_idx = th_list.index(th)
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def classify_apartment_type(apartment_type):
+        # The same handful of strings ("2BHK", "SHOP", ...) repeat across thousands of rows.
+        match = APARTMENT_TYPE_RE.match(apartment_type)
+        if match is None:
+            return "others"
+        return APARTMENT_TYPE_PATTERNS[match.lastindex - 1][0]
+
+    def extract_building_details(self, table_index, key):
+        try:
+            final_value = 0
 
-                value = list(th.getparent().itersiblings("tr"))[0].findall("td")[th_idx].text
+            for table, th_idx in table_index.columns(key):
+                value = table.rows[0][th_idx]
 
                 final_value += self.safe_int(value)
 
@@ -574,13 +435,13 @@ class MahareraitVerifier(BaseVerifier):
 
         return final_value
 
-    def extract_building_tasks(self, tree, key):
+    def extract_building_tasks(self, table_index, key):
         try:
-            td_arr = tree.xpath(f"//td[text()[normalize-space() = '{key}']]/following-sibling::td")
             final_value = 0
 
-            for td in td_arr:
-                final_value += self.safe_int(td.text)
+            for cells, td_idx in table_index.cells(key):
+                for value in cells[td_idx + 1:]:
+                    final_value += self.safe_int(value)
 
         except Exception as exc:
             print(f"Could not find {key}", exc)
@@ -590,99 +451,636 @@ class MahareraitVerifier(BaseVerifier):
 
     @staticmethod
     def clean_number(value):
-        if value is None:
-            return None
+        return numeric.clean_number(value)
 
-        # Remove all non-digit and non-dot characters
-        cleaned_value = re.sub(r'[^\d.]', '', value)
-
-        # Replace consecutive dots with a single dot
-        cleaned_value = re.sub(r'\.+', '.', cleaned_value)
+    @staticmethod
+    def safe_float(value) -> float:
+        return numeric.safe_float(value)
 
-        return cleaned_value
+    @staticmethod
+    def safe_int(value) -> int:
+        return numeric.safe_int(value)
 
-    def safe_float(self, value) -> float:
-        cleaned_number = self.clean_number(value)
+    def search_query(self):
+        if self.journal_path and self.parquet_path:
+            raise ValueError("parquet_path cannot be resumed from the journal, set journal_path = None to use it")
 
         try:
-            result = cleaned_number and float(cleaned_number) or 0.0
-            return result
-        except ValueError:
-            return 0.0
+            while self.current_retries < self.max_retries:
+                try:
+                    self.recover_journal()
+                    current_state = self.load_state()
+
+                    for district_name, current_page, total_pages, tree in self.iter_listing_pages(state=current_state):
+                        self.save_projects(self.extract_projects_list_data(tree))
+                        self.checkpoint_journal()
+                        self.save_state(district_name, current_page, total_pages)
+
+                    # Crawl finished, the next run starts over.
+                    self.reset_journal()
+                    self.save_state("", -1, 0)
+                    break
+                except Exception as exc:
+                    print("Unexpected error occurred", exc)
+                    print(f"Retrying in  {self.retry_delay}")
+                    self.current_retries += 1
+                    time.sleep(self.retry_delay)
+        finally:
+            self.close_writers()
+            self.close_parse_pool()
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+    def get_journal(self):
+        with self.stores_lock:
+            if self.journal is None and self.journal_path:
+                self.journal = ProjectJournal(self.journal_path, self.journal_compact_every)
+        return self.journal
+
+    def recover_journal(self):
+        # Brings the outputs in line with the journal: CSV rows written after the last checkpoint are dropped,
+        # and the projects journaled after it are written again (SQLite upserts them by certificate number).
+        journal = self.get_journal()
+        if journal is None:
+            return
+
+        self.get_writers()
+        if journal.csv_offset is None:
+            journal.checkpoint(self.csv_writer.checkpoint())
+            return
+
+        self.csv_writer.truncate(journal.csv_offset)
+
+        pending = [templates.ProjectRecord(data) for data in journal.pending]
+        if pending:
+            print(f"Recovered {len(pending)} projects from the journal")
+            self.save_projects(pending)
+        self.checkpoint_journal()
+
+    def checkpoint_journal(self):
+        if self.journal is not None:
+            # Every output has to hold the journaled projects before they count as written.
+            self.get_writers()
+            self.checkpoint_writers()
+            self.journal.checkpoint(self.csv_writer.checkpoint())
+
+    def reset_journal(self):
+        if self.journal is not None:
+            self.get_writers()
+            self.checkpoint_writers()
+            self.journal.reset(self.csv_writer.checkpoint())
+
+    def query_listing_page(self, district_id, current_page=0):
+        payload_data = templates.search_query_template(self.token, self.maharashtra_state_id, district_id,
+                                                       current_page)
+        payload = urllib.parse.urlencode(payload_data)
+
+        header = {**self.headers, "content-type": "application/x-www-form-urlencoded"}
+
+        resp = self.smart_request("POST", self.search_query_url, headers=header, data=payload, verify=False)
+
+        return self.get_etree(resp)
+
+    def iter_listing_pages(self, districts=None, pages=None, state=None):
+        # Yields (district name, page, total pages, listing tree) district by district. "pages" limits the
+        # page numbers, "state" (see load_state) skips the districts and pages an earlier run already saved.
+        all_districts = self.filter_districts(self.get_districts(), districts)
+
+        for district in tqdm(all_districts):
+            district_id = district.get("ID")
+            district_name = district.get("Text")
+
+            last_page = -1
+            if state and state.get("current_district"):
+                if district_name.upper() < state["current_district"].upper():
+                    print(f"Skipping '{district_name}' as it is already processed.")
+                    continue
+
+                if district_name.upper() == state["current_district"].upper():
+                    last_page = state.get("current_page", -1)
+                    if state.get("total_pages") and last_page + 1 >= state["total_pages"]:
+                        print(f"Skipping '{district_name}' as it is already processed.")
+                        continue
+
+            # The first page is always needed for the number of pages.
+            tree = self.query_listing_page(district_id, 0)
+            total_pages = self.safe_int(xpaths.total_pages(tree)[0])
+
+            for current_page in range(total_pages):
+                if current_page <= last_page:
+                    print(f"Page {current_page} already processed")
+                    continue
+                if pages is not None and current_page not in pages:
+                    continue
+
+                if current_page:
+                    tree = self.query_listing_page(district_id, current_page)
+
+                yield district_name, current_page, total_pages, tree
+
+    def iter_projects(self, districts=None, pages=None):
+        # Yields every project record as soon as its details and certificate are done, page by page,
+        # so only one listing page worth of projects is ever held in memory.
+        # In incremental mode a record is indexed once the caller asks for the next one, i.e. is done with it.
+        if self.token is None:
+            self.token = self.get_token()
+
+        futures = []
+        try:
+            for _, _, _, tree in self.iter_listing_pages(districts, pages):
+                rows = self.extract_project_rows(tree)
 
-    def safe_int(self, value) -> int:
-        cleaned_number = self.clean_number(value)
+                if self.concurrent_workers > 1:
+                    futures = [self.get_executor().submit(self.download_project_data_pooled, row) for row in rows]
+                    results = (lambda future=future: self.finish_project_data(future.result())
+                               for future in as_completed(futures))
+                else:
+                    results = (lambda row=row: self.fetch_project_data(row) for row in rows)
+
+                for result in results:
+                    try:
+                        project_data = result()
+                    except Exception as exc:
+                        print("Could not fetch project data", exc)
+                        continue
+
+                    yield project_data
+
+                    if self.incremental:
+                        self.get_project_index().update_many(
+                            [(project_data["View Certificate"], project_data["Last Modified Date"])])
+        finally:
+            # A caller that stops early does not want the rest of the page, downloads not started yet are dropped.
+            for future in futures:
+                future.cancel()
+            self.close_parse_pool()
 
-        try:
-            result = cleaned_number and int(cleaned_number) or 0
-            return result
-        except ValueError:
-            return 0
+    def extract_projects_list_data(self, tree):
+        # Listing rows are read on this thread, only the detail/certificate round trips are fanned out.
+        rows = self.extract_project_rows(tree)
 
-    def search_query(self):
+        if self.concurrent_workers > 1:
+            # executor.map keeps the results in row order, the parsed records are collected on this thread.
+            downloads = list(self.get_executor().map(self.download_project_data_pooled, rows))
+        else:
+            downloads = map(self.download_project_data, rows)
+
+        return [self.finish_project_data_journaled(row, download) for row, download in zip(rows, downloads)]
+
+    def finish_project_data_journaled(self, row, download):
+        project_data = self.finish_project_data(download)
+
+        if self.journal is not None:
+            self.journal.add(row[1], dict(project_data))
+        return project_data
+
+    def extract_project_rows(self, tree):
+        projects_list = xpaths.projects_list(tree)
+
+        rows = [self.extract_project_row(project) for project in projects_list[:10]]
+
+        if self.incremental:
+            project_index = self.get_project_index()
+            unchanged = [row for row in rows if project_index.is_unchanged(row[0]["View Certificate"],
+                                                                           row[0]["Last Modified Date"])]
+            if unchanged:
+                print(f"Skipping {len(unchanged)} unchanged projects")
+                rows = [row for row in rows if row not in unchanged]
+
+        if self.journal is not None:
+            # Keyed by the details URL, projects without a certificate number are journaled too.
+            done = [row for row in rows if self.journal.is_done(row[1])]
+            if done:
+                print(f"Skipping {len(done)} projects already in the journal")
+                rows = [row for row in rows if not self.journal.is_done(row[1])]
+
+        if self.incremental and self.response_cache is not None:
+            # A changed project's cached detail page is the old one, it has to come from the site again.
+            # Certificates are left alone, they never change.
+            project_index = self.get_project_index()
+            for project_data, view_details_url, _ in rows:
+                if project_index.get_last_modified(project_data["View Certificate"]):
+                    self.response_cache.discard("GET", view_details_url)
+
+        return rows
+
+    def get_project_index(self):
+        with self.stores_lock:
+            if self.project_index is None:
+                self.project_index = ProjectIndex(self.project_index_path)
+        return self.project_index
+
+    def save_projects(self, result_list):
+        if not result_list:
+            return
+
+        for writer in self.get_writers():
+            writer.write_rows(result_list)
+
+        if self.incremental:
+            # Only indexed once on disk, so a crash before this point means the projects get fetched again.
+            self.checkpoint_writers()
+            self.get_project_index().update_many(
+                (project_data["View Certificate"], project_data["Last Modified Date"]) for project_data in result_list
+            )
+
+    def get_writers(self):
+        with self.stores_lock:
+            if self.writers is None:
+                self.csv_writer = CsvWriter(self.csv_path, templates.projects_data_fields(), self.csv_flush_rows,
+                                            self.csv_flush_interval)
+                self.writers = [self.csv_writer]
+                if self.parquet_path:
+                    self.writers.append(
+                        ParquetWriter(self.parquet_path, templates.projects_data_fields(),
+                                      self.parquet_row_group_size))
+                if self.sqlite_path:
+                    self.writers.append(
+                        SqliteWriter(self.sqlite_path, templates.projects_data_fields(), self.sqlite_batch_rows))
+        return self.writers
+
+    def checkpoint_writers(self):
+        for writer in self.writers or ():
+            writer.checkpoint()
+
+    def close_writers(self):
+        with self.stores_lock:
+            writers, self.writers, self.csv_writer = self.writers, None, None
+        # Every writer gets closed, the first failure is raised afterwards.
+        errors = []
+        for writer in writers or ():
+            try:
+                writer.close()
+            except Exception as exc:
+                print("Could not close writer", exc)
+                errors.append(exc)
+        if errors:
+            raise errors[0]
+
+    def extract_project_row(self, project):
+        td_arr = project.getchildren()
+        project_data = templates.ProjectRecord()
+
+        project_data["Project Name"] = td_arr[1].text
+        print(project_data["Project Name"])
+        project_data["Promoter Name"] = td_arr[2].text
+        project_data["Last Modified Date"] = td_arr[3].text
+
+        view_details_url = self.url + td_arr[4].find("b/a").get("href")
+
+        certificate_qstr = None
         try:
-            for i in tqdm(['page 1.html']):
-                with open(i, 'r') as f:
-                    resp = f.read()
-                tree = self.get_etree(resp)
+            certificate_id = td_arr[6].find("b/a[2]").get("data-docname")
+            project_data["View Certificate"] = certificate_id
 
-                self.append_to_csv(self.extract_projects_list_data(tree))
+            certificate_qstr = td_arr[6].find("b/a[2]").get("data-qstr")
         except Exception as exc:
-            print("Unexpected error occurred", exc)
-            print(f"Retrying in  {self.retry_delay}")
-            time.sleep(self.retry_delay)
-
-    def extract_projects_list_data(self, tree):
-        projects_list_xpath = "//table/tbody/tr"
-        projects_list = tree.xpath(projects_list_xpath)
+            print("Could not find certificate data", exc)
 
-        result_list = []
+        return project_data, view_details_url, certificate_qstr
 
-        for project in projects_list[:10]:
-            td_arr = project.getchildren()
-            project_data = templates.projects_data_template()
+    def fetch_project_data(self, row):
+        return self.finish_project_data(self.download_project_data(row))
 
-            project_data["Project Name"] = td_arr[1].text
-            print(project_data["Project Name"])
-            project_data["Promoter Name"] = td_arr[2].text
-            project_data["Last Modified Date"] = td_arr[3].text
+    def download_project_data(self, row):
+        # Only the network round trips, the parses are left running for finish_project_data(), so a fetching
+        # thread moves on to its next project instead of waiting for a parser.
+        project_data, view_details_url, certificate_qstr = row
 
-            # Extracting view details page.
-            view_details_url = "https://maharerait.mahaonline.gov.in/" + td_arr[4].find("b/a").get("href")
-            view_details_data = self.view_details_query(view_details_url)
-            # break
+        # Extracting view details page, the certificate is downloaded while it is being parsed.
+        view_details_future = self.submit_parse(parse_view_details, self.view_details_content(view_details_url),
+                                                project_data)
 
-            project_data = {**project_data, **view_details_data}
+        certificate_id = project_data["View Certificate"]
+        certificate_date = self.get_certificate_store().get_date(certificate_id)
 
+        certificate_data = None
+        certificate_future = None
+        if not certificate_date and certificate_qstr:
             try:
                 # Extracting certificate_data
-                certificate_id = td_arr[6].find("b/a[2]").get("data-docname")
-                project_data["View Certificate"] = certificate_id
+                certificate_data = self.show_certificate(certificate_qstr)
+                certificate_future = self.submit_parse(parse_certificate_date, certificate_data)
+            except Exception as exc:
+                print("Could not find certificate data", exc)
 
-                certificate_qstr = td_arr[6].find("b/a[2]").get("data-qstr")
+        return view_details_future, certificate_id, certificate_date, certificate_data, certificate_future
 
-                cert_base64 = self.show_certificate(certificate_qstr)
+    def finish_project_data(self, download):
+        view_details_future, certificate_id, certificate_date, certificate_data, certificate_future = download
 
-                decoded_data = base64.b64decode(cert_base64)
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(decoded_data))
+        # Parsed in another process, so the filled in record comes back as a new object.
+        project_data = view_details_future.result()
 
-                pdf_text = ""
-                num_pages = len(pdf_reader.pages)
-                for page_num in range(num_pages):
-                    page = pdf_reader.pages[page_num]
-                    pdf_text += page.extract_text()
+        if certificate_date:
+            project_data["Certificate Date"] = certificate_date
+        elif certificate_future is not None:
+            try:
+                project_data["Certificate Date"] = certificate_future.result()
+                self.store_certificate(certificate_id, project_data["Certificate Date"], certificate_data)
+            except Exception as exc:
+                print("Could not find certificate data", exc)
+
+        return project_data
 
-                pdf_text = pdf_text.replace("\xa0", " ").replace("\n", "")
+    def get_parse_pool(self):
+        with self.stores_lock:
+            if self.parse_pool is None and self.parse_processes > 0:
+                self.parse_pool = ParsePool(type(self), self.parse_processes, self.parse_queue_size)
+        return self.parse_pool
 
-                cert_date_match = re.search("commencing from {2}([0-9/]+) {2}and ending", pdf_text)
+    def close_parse_pool(self):
+        with self.stores_lock:
+            parse_pool, self.parse_pool = self.parse_pool, None
+        if parse_pool is not None:
+            parse_pool.close()
 
-                project_data["Certificate Date"] = cert_date_match.group(1)
+    def submit_parse(self, parse, *args):
+        parse_pool = self.get_parse_pool()
+        if parse_pool is not None:
+            return parse_pool.submit(parse, *args)
+
+        future = Future()
+        try:
+            future.set_result(parse(*args, verifier=self))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def get_certificate_store(self):
+        with self.stores_lock:
+            if self.certificate_store is None:
+                self.certificate_store = CertificateStore(self.certificate_store_path)
+        return self.certificate_store
+
+    def store_certificate(self, certificate_id, certificate_date, certificate):
+        pdf = self.store_certificate_pdfs and self.open_certificate(certificate).getvalue() or None
+        try:
+            self.get_certificate_store().add(certificate_id, certificate_date, pdf)
+        except sqlite3.Error as exc:
+            # Only the store misses out, the project keeps the date that was just parsed.
+            print(f"Could not store certificate {certificate_id}", exc)
+
+    @staticmethod
+    def open_certificate(certificate):
+        # show_certificate gives either the base64 payload or, when streaming, the already decoded PDF file.
+        if hasattr(certificate, "read"):
+            certificate.seek(0)
+            return certificate
+        return io.BytesIO(base64_stream.decode(certificate))
+
+    @classmethod
+    def extract_certificate_date(cls, certificate):
+        pdf_reader = PyPDF2.PdfReader(cls.open_certificate(certificate))
+
+        # The validity sentence is on the first page, so pages are only extracted until it shows up.
+        # The text is still accumulated in case the sentence is split over a page break.
+        pdf_text = ""
+        cert_date_match = None
+        for page in pdf_reader.pages:
+            pdf_text += page.extract_text().replace("\xa0", " ").replace("\n", "")
+
+            cert_date_match = CERTIFICATE_DATE_RE.search(pdf_text)
+            if cert_date_match:
+                break
+
+        return cert_date_match.group(1)
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrent_workers)
+        return self.executor
+
+    def download_project_data_pooled(self, row):
+        # Every worker uses its own session for the duration of a project, borrowed from the shared pool.
+        with self.borrowed_session():
+            return self.download_project_data(row)
+
+    def get_work_queue(self):
+        with self.stores_lock:
+            if self.work_queue is None:
+                self.work_queue = WorkQueue(self.work_queue_path, self.work_queue_lease, self.work_queue_max_attempts,
+                                            self.retry_delay)
+        return self.work_queue
+
+    def seed_work_queue(self, districts=None):
+        # Only the first page of every district, it queues the district's other pages once it knows how many.
+        all_districts = self.filter_districts(self.get_districts(), districts)
+        self.get_work_queue().put_many("page", [
+            (f"page:{district.get('ID')}:0", {"district_id": district.get("ID"), "district": district.get("Text"),
+                                              "page": 0})
+            for district in all_districts
+        ])
+
+    def run_work_queue(self, worker_id=None):
+        # Leases and runs tasks until the queue is drained, failures only ever retry their own task.
+        work_queue = self.get_work_queue()
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+        if self.token is None:
+            self.token = self.get_token()
+
+        while True:
+            task = work_queue.lease(worker_id)
+            if task is None:
+                if work_queue.is_drained():
+                    return
+                # Tasks held by other workers or waiting out a retry delay.
+                time.sleep(1)
+                continue
+
+            try:
+                result = self.run_task(task)
             except Exception as exc:
-                print("Could not find certificate data", exc)
+                print(f"Task {task.key} failed (attempt {task.attempts})", exc)
+                work_queue.fail(task, repr(exc))
+            else:
+                work_queue.ack(task, result)
+
+    def run_task(self, task):
+        if task.kind == "page":
+            return self.run_page_task(task.payload)
+        if task.kind == "project":
+            return self.run_project_task(task.payload)
+        raise ValueError(f"Unknown task kind '{task.kind}'")
+
+    def run_page_task(self, payload):
+        tree = self.query_listing_page(payload["district_id"], payload["page"])
+        work_queue = self.get_work_queue()
+
+        if payload["page"] == 0:
+            total_pages = self.safe_int(xpaths.total_pages(tree)[0])
+            work_queue.put_many("page", [
+                (f"page:{payload['district_id']}:{page}", {**payload, "page": page}) for page in range(1, total_pages)
+            ])
+
+        work_queue.put_many("project", [
+            (f"project:{view_details_url}", {"project_data": dict(project_data), "view_details_url": view_details_url,
+                                             "certificate_qstr": certificate_qstr})
+            for project_data, view_details_url, certificate_qstr in self.extract_project_rows(tree)
+        ])
+
+    def run_project_task(self, payload):
+        row = (templates.ProjectRecord(payload["project_data"]), payload["view_details_url"],
+               payload["certificate_qstr"])
+        return dict(self.fetch_project_data(row))
+
+    def export_work_queue(self):
+        # Finished projects are written from the queue by one process, so the workers never share an output file.
+        # A task's result is one project, or a list of them for a shard.
+        work_queue = self.get_work_queue()
+        for batch in work_queue.iter_results():
+            records = []
+            for _, result in batch:
+                records.extend(templates.ProjectRecord(data) for data in
+                               (result if isinstance(result, list) else [result]))
+            self.save_projects(records)
+            self.checkpoint_writers()
+            work_queue.mark_exported([task_id for task_id, _ in batch])
+
+    @classmethod
+    def work_queue_worker(cls, worker_id=None):
+        verifier = cls(None)
+        # The workers are the parallelism here, so each one parses on its own thread.
+        verifier.parse_processes = 0
+        verifier.run_work_queue(worker_id)
+
+    @classmethod
+    def fetch_data_queued(cls, districts=None, processes=None):
+        verifier = cls(None)
+        work_queue = verifier.get_work_queue()
+
+        try:
+            # Whatever a crashed run finished but did not write yet.
+            verifier.export_work_queue()
+
+            if work_queue.is_drained():
+                work_queue.clear()
+                verifier.seed_work_queue(districts)
+
+            workers = [multiprocessing.Process(target=cls.work_queue_worker)
+                       for _ in range(processes or cls.work_queue_processes)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            verifier.export_work_queue()
+        finally:
+            verifier.close_writers()
+
+        counts = work_queue.counts()
+        print(f"Work queue: {counts.get('done', 0)} done, {counts.get('dead', 0)} dead letters")
+        return counts
+
+    def run_shard_worker(self, coordinator_url, worker_id=None):
+        # One machine of a distributed crawl: its own session and token, shards leased from the coordinator.
+        client = CoordinatorClient(coordinator_url, worker_id or f"{socket.gethostname()}-{os.getpid()}")
+
+        if self.token is None:
+            self.token = self.get_token()
+
+        while True:
+            task, drained = client.lease()
+            if task is None:
+                if drained:
+                    return
+                time.sleep(1)
+                continue
+
+            try:
+                records, total_pages = self.run_shard(task, client)
+            except Exception as exc:
+                print(f"Shard {task['key']} failed (attempt {task['attempts']})", exc)
+                client.fail(task, repr(exc))
+            else:
+                client.ack(task, records, total_pages)
+
+    def run_shard(self, task, client):
+        payload = task["payload"]
+        records = []
+        total_pages = None
+
+        for current_page in range(payload["start"], payload["stop"]):
+            tree = self.query_listing_page(payload["district_id"], current_page)
+            if current_page == 0:
+                total_pages = self.safe_int(xpaths.total_pages(tree)[0])
+
+            records.extend(dict(project_data) for project_data in self.extract_projects_list_data(tree))
+
+            if not client.renew(task):
+                raise RuntimeError("Lease expired")
+
+        return records, total_pages
+
+    @classmethod
+    def shard_worker(cls, coordinator_url, worker_id=None):
+        verifier = cls(None)
+        # Like the work queue workers, the worker processes are the parallelism.
+        verifier.parse_processes = 0
+        verifier.run_shard_worker(coordinator_url, worker_id)
+
+    @classmethod
+    def serve_coordinator(cls, districts=None, host=None, port=None):
+        # Runs until every shard is done, writing the workers' results to the outputs as they come in.
+        verifier = cls(None)
+        verifier.work_queue_path = cls.coordinator_queue_path
+        work_queue = verifier.get_work_queue()
+        coordinator = Coordinator(work_queue, cls.shard_pages)
 
-            result_list.append(project_data)
+        try:
+            verifier.export_work_queue()
+
+            if work_queue.is_drained():
+                work_queue.clear()
+                coordinator.seed(cls.filter_districts(verifier.get_districts(), districts))
+
+            server = coordinator.serve(host or cls.coordinator_host, port or cls.coordinator_port)
+            try:
+                while not work_queue.is_drained():
+                    time.sleep(1)
+                    verifier.export_work_queue()
+
+                    if time.monotonic() - coordinator.last_contact > cls.coordinator_worker_timeout:
+                        # The shards left stay queued, the next run picks them up.
+                        raise RuntimeError(f"No worker contacted the coordinator for "
+                                           f"{cls.coordinator_worker_timeout} seconds, shards: {work_queue.counts()}")
+                verifier.export_work_queue()
+
+                # Idle workers poll every second, give them the chance to hear the crawl is over.
+                time.sleep(2)
+            finally:
+                server.shutdown()
+                server.server_close()
+        finally:
+            verifier.close_writers()
+
+        counts = work_queue.counts()
+        print(f"Coordinator: {counts.get('done', 0)} shards done, {counts.get('dead', 0)} dead letters")
+        return counts
 
-        return result_list
+    @classmethod
+    def fetch_data_distributed(cls, workers=4, districts=None):
+        # The whole distributed setup on one machine, a coordinator process and local worker processes.
+        coordinator_url = f"http://{cls.coordinator_host}:{cls.coordinator_port}"
+
+        processes = [multiprocessing.Process(target=cls.serve_coordinator, args=(districts,))]
+        processes += [multiprocessing.Process(target=cls.shard_worker, args=(coordinator_url, f"local-{i}"))
+                      for i in range(workers)]
+        for process in processes:
+            process.start()
+
+        # Workers only stop when the coordinator tells them the crawl is over, one that missed it (or a
+        # coordinator that gave up) leaves them waiting for good.
+        processes[0].join()
+        for process in processes[1:]:
+            process.join(10)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if processes[0].exitcode:
+            raise RuntimeError(f"Coordinator failed with exit code {processes[0].exitcode}")
 
     @staticmethod
     def save_state(district, current_page, total_pages):
@@ -703,19 +1101,6 @@ class MahareraitVerifier(BaseVerifier):
                 json.dump(init_state, f)
                 return init_state
 
-    @staticmethod
-    def append_to_csv(data):
-        try:
-            with open('rera_data.csv', 'a+', newline='', encoding="utf-8") as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=[*data[0].keys()])
-
-                if csvfile.tell() == 0:
-                    writer.writeheader()
-
-                writer.writerows(data)
-        except Exception as exc:
-            print("Exception while saving data to csv", exc)
-
     @staticmethod
     def regex_match(regex, string):
         if re.search(regex, string, re.IGNORECASE):
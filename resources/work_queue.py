@@ -0,0 +1,214 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class Task(object):
+    __slots__ = ('id', 'kind', 'key', 'payload', 'attempts', 'worker')
+
+    def __init__(self, id, kind, key, payload, attempts, worker):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.worker = worker
+
+
+class WorkQueue(object):
+    # Durable task queue shared by any number of worker processes through one SQLite file.
+    # A leased task belongs to its worker until the lease expires, ack() completes it (storing its result),
+    # fail() makes it available again after a backoff, or moves it to dead_letters after max_attempts.
+    def __init__(self, path, lease_seconds=300, max_attempts=5, retry_delay=5, max_retry_delay=300):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lock = threading.Lock()
+
+        # Transactions are managed by hand so every write takes the lock up front (BEGIN IMMEDIATE),
+        # instead of failing on a lock upgrade when several processes write at once.
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        with self.lock, self.transaction():
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "id INTEGER PRIMARY KEY, "
+                "kind TEXT NOT NULL, "
+                "key TEXT NOT NULL UNIQUE, "
+                "payload TEXT NOT NULL, "
+                "state TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "available_at REAL NOT NULL DEFAULT 0, "
+                "worker TEXT, "
+                "last_error TEXT, "
+                "result TEXT, "
+                "exported INTEGER NOT NULL DEFAULT 0)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS tasks_available ON tasks (state, available_at)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letters ("
+                "id INTEGER PRIMARY KEY, "
+                "kind TEXT NOT NULL, "
+                "key TEXT NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL, "
+                "last_error TEXT, "
+                "failed_at REAL NOT NULL)"
+            )
+
+    def transaction(self):
+        return Transaction(self.connection)
+
+    def put_many(self, kind, items):
+        # items are (key, payload) pairs, a key that was ever queued is never queued again.
+        rows = [(kind, key, json.dumps(payload)) for key, payload in items]
+        with self.lock, self.transaction():
+            self.connection.executemany("INSERT OR IGNORE INTO tasks (kind, key, payload) VALUES (?, ?, ?)", rows)
+
+    def put(self, kind, key, payload):
+        self.put_many(kind, [(key, payload)])
+
+    def lease(self, worker, lease_seconds=None):
+        now = time.time()
+        with self.lock, self.transaction():
+            # Leases that ran out on their last attempt (a worker died on it) go to the dead letters.
+            for row in self.connection.execute(
+                    "SELECT id FROM tasks WHERE state = 'leased' AND available_at <= ? AND attempts >= ?",
+                    (now, self.max_attempts)).fetchall():
+                self.bury(row[0], "lease expired", now)
+
+            row = self.connection.execute(
+                "SELECT id, kind, key, payload, attempts FROM tasks "
+                "WHERE state IN ('pending', 'leased') AND available_at <= ? ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            task_id, kind, key, payload, attempts = row
+            self.connection.execute(
+                "UPDATE tasks SET state = 'leased', attempts = ?, available_at = ?, worker = ? WHERE id = ?",
+                (attempts + 1, now + (lease_seconds or self.lease_seconds), worker, task_id)
+            )
+        return Task(task_id, kind, key, json.loads(payload), attempts + 1, worker)
+
+    def get(self, task_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT id, kind, key, payload, attempts, worker FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return Task(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5])
+
+    def ack(self, task, result=None, follow_up=()):
+        # Only the current holder of the lease can complete the task, a late worker's ack is ignored.
+        # follow_up tasks, (kind, key, payload) triples, are queued in the same transaction when the ack counts.
+        with self.lock, self.transaction():
+            cursor = self.connection.execute(
+                "UPDATE tasks SET state = 'done', result = ?, last_error = NULL "
+                "WHERE id = ? AND state = 'leased' AND worker = ?",
+                (result is not None and json.dumps(result) or None, task.id, task.worker)
+            )
+            if cursor.rowcount == 1 and follow_up:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO tasks (kind, key, payload) VALUES (?, ?, ?)",
+                    [(kind, key, json.dumps(payload)) for kind, key, payload in follow_up]
+                )
+        return cursor.rowcount == 1
+
+    def renew(self, task, lease_seconds=None):
+        # Long tasks keep their lease by renewing it, False means it expired and went to another worker.
+        with self.lock, self.transaction():
+            cursor = self.connection.execute(
+                "UPDATE tasks SET available_at = ? WHERE id = ? AND state = 'leased' AND worker = ?",
+                (time.time() + (lease_seconds or self.lease_seconds), task.id, task.worker)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, task, error):
+        now = time.time()
+        with self.lock, self.transaction():
+            row = self.connection.execute(
+                "SELECT attempts FROM tasks WHERE id = ? AND state = 'leased' AND worker = ?",
+                (task.id, task.worker)
+            ).fetchone()
+            if row is None:
+                return
+
+            if row[0] >= self.max_attempts:
+                self.connection.execute("UPDATE tasks SET last_error = ? WHERE id = ?", (error, task.id))
+                self.bury(task.id, error, now)
+            else:
+                delay = min(self.retry_delay * 2 ** (row[0] - 1), self.max_retry_delay)
+                self.connection.execute(
+                    "UPDATE tasks SET state = 'pending', available_at = ?, worker = NULL, last_error = ? "
+                    "WHERE id = ?",
+                    (now + delay, error, task.id)
+                )
+
+    def bury(self, task_id, error, now):
+        self.connection.execute(
+            "INSERT INTO dead_letters (kind, key, payload, attempts, last_error, failed_at) "
+            "SELECT kind, key, payload, attempts, COALESCE(?, last_error), ? FROM tasks WHERE id = ?",
+            (error, now, task_id)
+        )
+        self.connection.execute("UPDATE tasks SET state = 'dead', worker = NULL WHERE id = ?", (task_id,))
+
+    def requeue_dead_letters(self):
+        with self.lock, self.transaction():
+            self.connection.execute(
+                "UPDATE tasks SET state = 'pending', attempts = 0, available_at = 0 WHERE state = 'dead'")
+            self.connection.execute("DELETE FROM dead_letters")
+
+    def clear(self):
+        with self.lock, self.transaction():
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.execute("DELETE FROM dead_letters")
+
+    def counts(self):
+        with self.lock:
+            return dict(self.connection.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+
+    def is_drained(self):
+        # Nothing left to do, neither available nor held by another worker.
+        counts = self.counts()
+        return not counts.get('pending') and not counts.get('leased')
+
+    def iter_results(self, batch_size=500):
+        # Finished results not exported yet, in queue order. mark_exported() them once they are written.
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT id, result FROM tasks WHERE state = 'done' AND exported = 0 AND result IS NOT NULL "
+                    "AND id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [(task_id, json.loads(result)) for task_id, result in rows]
+
+    def mark_exported(self, task_ids):
+        with self.lock, self.transaction():
+            self.connection.executemany("UPDATE tasks SET exported = 1 WHERE id = ?", [(i,) for i in task_ids])
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class Transaction(object):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute(exc_type is None and "COMMIT" or "ROLLBACK")
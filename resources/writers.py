@@ -0,0 +1,306 @@
+import csv
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import resources.numeric as numeric
+
+
+class CsvWriter(object):
+    # Keeps the output file open for the whole crawl and writes rows in batches, under a fixed column order.
+    # Buffered rows go out every flush_rows rows or flush_interval seconds, checkpoint() also fsyncs them.
+    def __init__(self, path, fieldnames, flush_rows=500, flush_interval=30):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+        self.file = open(path, 'a', newline='', encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames)
+
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write_rows(self, rows):
+        with self.lock:
+            self.buffer.extend(rows)
+
+            if len(self.buffer) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush_buffer()
+
+    def flush_buffer(self):
+        # A failed write keeps the rows buffered and raises, so checkpoint() never reports them as on disk.
+        self.writer.writerows(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+        self.last_flush = time.monotonic()
+
+    def checkpoint(self):
+        # Returns the size of the file, everything up to it is on disk.
+        with self.lock:
+            self.flush_buffer()
+            os.fsync(self.file.fileno())
+            return self.file.tell()
+
+    def truncate(self, offset):
+        # Drops the buffered rows and everything written after offset, the header is written again if needed.
+        with self.lock:
+            self.buffer.clear()
+            self.file.flush()
+            if self.file.tell() > offset:
+                self.file.truncate(offset)
+                self.file.seek(offset)
+            if offset == 0:
+                self.writer.writeheader()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            try:
+                self.flush_buffer()
+                os.fsync(self.file.fileno())
+            finally:
+                self.file.close()
+
+
+# Parquet column types, any field not listed here is written as a plain string.
+PARQUET_DATE_FIELDS = (
+    "Last Modified Date",
+    "Certificate Date",
+    "Proposed Date of Completion",
+    "Revised Proposed Date of Completion",
+)
+PARQUET_DICTIONARY_FIELDS = (
+    "Project Status",
+    "Project Type",
+    "Division",
+    "District",
+    "Taluka",
+    "Village",
+    "Bank Name",
+)
+PARQUET_INT_FIELDS = (
+    "Total Number of Proposed Building/Wings (In the Layout/Plot)",
+    "Number of Sanctioned Floors",
+    "Total no. of open Parking as per Sanctioned Plan (4-wheeler+2-Wheeler)",
+    "Number of Closed Parking",
+    "complaint_details",
+    "litigation_details",
+)
+PARQUET_FLOAT_FIELDS = (
+    "Total Plot/Project area (sqmts)",
+    "Total Recreational Open Space as Per Sanctioned Plan",
+    "Sanctioned FSI of the project applied for registration (Sanctioned Built-up Area)",
+    "Built-up-Area as per Proposed FSI (In sqmts) ( Proposed but not sanctioned) "
+    "(As soon as approved, should be immediately updated in Approved FSI)",
+    "Permissible Total FSI of Plot (Permissible Built-up Area)",
+    "Carpet Area (in Sqmts)",
+    "Excavation",
+    "X number of Slabs of Super Structure",
+    "Installation of lifts, water pumps, Fire Fighting Fittings and Equipment",
+    "Number of Apartment",
+    "Number of Booked Apartment",
+    "Total Plots",
+    "Total Area of All Plots",
+)
+PARQUET_FLOAT_PREFIXES = ("carpet_area_", "apartments_", "booked_apartments_", "Plots ")
+PARQUET_BOOL_FIELDS = ("form_4", "conveyance")
+
+
+def is_blank(value):
+    return value is None or isinstance(value, str) and not value.strip()
+
+
+def to_date(value):
+    if is_blank(value):
+        return None
+    try:
+        return datetime.datetime.strptime(str(value).split()[0], "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+def to_float(value):
+    return None if is_blank(value) else numeric.safe_float(value)
+
+
+def to_int(value):
+    return None if is_blank(value) else numeric.safe_int(value)
+
+
+def to_bool(value):
+    return None if is_blank(value) else value == "YES"
+
+
+def to_str(value):
+    return None if value is None else str(value)
+
+
+class ParquetWriter(object):
+    # Typed columnar copy of the output. pyarrow is only imported when this writer is used.
+    # Rows are buffered into row groups of row_group_size, the file is only readable once closed
+    # (that is when the Parquet footer gets written).
+    # path is a dataset directory and each writer adds one part file to it, so earlier runs are never truncated.
+    # The part file is hidden (a leading '.', which dataset readers skip) until it is closed.
+    def __init__(self, path, fieldnames, row_group_size=10000):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        os.makedirs(path, exist_ok=True)
+        name = f"part-{datetime.datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}.parquet"
+        self.path = os.path.join(path, name)
+        self.temp_path = os.path.join(path, "." + name)
+        self.fieldnames = fieldnames
+        self.row_group_size = row_group_size
+        self.lock = threading.Lock()
+        self.buffer = []
+
+        fields = []
+        self.converters = []
+        for field in fieldnames:
+            field_type, converter = self.get_field_type(field)
+            fields.append(pyarrow.field(field, field_type))
+            self.converters.append(converter)
+
+        self.schema = pyarrow.schema(fields)
+        self.writer = pyarrow.parquet.ParquetWriter(self.temp_path, self.schema, compression="zstd")
+
+    def get_field_type(self, field):
+        pyarrow = self.pyarrow
+        if field in PARQUET_DATE_FIELDS:
+            return pyarrow.date32(), to_date
+        if field in PARQUET_DICTIONARY_FIELDS:
+            return pyarrow.dictionary(pyarrow.int32(), pyarrow.string()), to_str
+        if field in PARQUET_INT_FIELDS:
+            return pyarrow.int64(), to_int
+        if field in PARQUET_FLOAT_FIELDS or field.startswith(PARQUET_FLOAT_PREFIXES):
+            return pyarrow.float64(), to_float
+        if field in PARQUET_BOOL_FIELDS:
+            return pyarrow.bool_(), to_bool
+        return pyarrow.string(), to_str
+
+    def write_rows(self, rows):
+        with self.lock:
+            self.buffer.extend(rows)
+
+            if len(self.buffer) >= self.row_group_size:
+                self.flush_buffer()
+
+    def flush_buffer(self):
+        if not self.buffer:
+            return
+
+        columns = [
+            self.pyarrow.array([converter(row.get(field)) for row in self.buffer], type=field_type.type)
+            for field, converter, field_type in zip(self.fieldnames, self.converters, self.schema)
+        ]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(columns, schema=self.schema))
+        self.buffer.clear()
+
+    def checkpoint(self):
+        with self.lock:
+            self.flush_buffer()
+
+    def close(self):
+        with self.lock:
+            if self.writer is None:
+                return
+            try:
+                self.flush_buffer()
+            finally:
+                # The row groups written so far still make a readable part.
+                self.writer.close()
+                self.writer = None
+                os.replace(self.temp_path, self.path)
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteWriter(object):
+    # One row per project keyed by its certificate number, so re-crawls update rows instead of adding them.
+    # Rows are upserted in batches of batch_rows, each batch in a single transaction.
+    key_field = "View Certificate"
+    indexed_fields = ("District", "Taluka", "Pin Code", "Street Pin Code", "Promoter Name")
+
+    def __init__(self, path, fieldnames, batch_rows=1000):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.batch_rows = batch_rows
+        self.lock = threading.Lock()
+        self.buffer = []
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        columns = [quote_identifier(field) for field in fieldnames]
+        key = quote_identifier(self.key_field)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                + ", ".join(column + (" PRIMARY KEY" if column == key else "") for column in columns)
+                + ", updated_at REAL NOT NULL)"
+            )
+            for i, field in enumerate(self.indexed_fields):
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS projects_index_{i} ON projects ({quote_identifier(field)})")
+
+        self.upsert_query = (
+            f"INSERT INTO projects ({', '.join(columns)}, updated_at) "
+            f"VALUES ({', '.join('?' for _ in columns)}, ?) "
+            f"ON CONFLICT({key}) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+            + ", updated_at = excluded.updated_at"
+        )
+
+    def write_rows(self, rows):
+        with self.lock:
+            self.buffer.extend(rows)
+
+            if len(self.buffer) >= self.batch_rows:
+                self.flush_buffer()
+
+    def flush_buffer(self):
+        if not self.buffer:
+            return
+
+        now = time.time()
+        # Projects without a certificate number cannot be keyed, NULL keys never conflict.
+        rows = [
+            [row.get(field) if field != self.key_field else row.get(field) or None for field in self.fieldnames]
+            + [now]
+            for row in self.buffer
+        ]
+        with self.connection:
+            self.connection.executemany(self.upsert_query, rows)
+        self.buffer.clear()
+
+    def get(self, certificate):
+        with self.lock:
+            cursor = self.connection.execute(
+                f"SELECT * FROM projects WHERE {quote_identifier(self.key_field)} = ?", (certificate,))
+            row = cursor.fetchone()
+        return row and dict(zip([column[0] for column in cursor.description], row))
+
+    def checkpoint(self):
+        with self.lock:
+            self.flush_buffer()
+
+    def close(self):
+        with self.lock:
+            if self.connection is None:
+                return
+            try:
+                self.flush_buffer()
+            finally:
+                self.connection.close()
+                self.connection = None
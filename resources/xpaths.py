@@ -0,0 +1,21 @@
+from lxml import etree
+
+# Every query used by the verifiers, compiled once at import. Detail page labels are looked up through
+# resources.label_index instead.
+
+hidden_inputs = etree.XPath("//form//input[@type='hidden']")
+
+# Listing page
+projects_list = etree.XPath("//table/tbody/tr")
+total_pages = etree.XPath("//label[text()='Total Pages :']/following-sibling::text()")
+
+# Details page documents
+form_4 = etree.XPath(
+    "//td/span[contains(text(), 'Certificates of Architect') or "
+    "contains(text(), 'Completion Certificate') or "
+    "contains(text(), 'certificate of completion') or "
+    "contains(text(), 'Certificate on Completion') or "
+    "contains(text(), 'Form 4')"
+    "]/../following-sibling::td/button")
+status_of_conveyance = etree.XPath(
+    "//td/span[text()[normalize-space() = '1 Status of Conveyance']]/../following-sibling::td/button")
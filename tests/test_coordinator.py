@@ -0,0 +1,119 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from resources.coordinator import Coordinator, CoordinatorClient
+from resources.work_queue import WorkQueue
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = WorkQueue(os.path.join(self.directory.name, "queue.sqlite3"), lease_seconds=60)
+        self.coordinator = Coordinator(self.queue, shard_pages=10)
+        self.coordinator.seed([{"ID": "1", "Text": "Pune"}])
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.queue.close()
+        self.directory.cleanup()
+
+    def serve(self):
+        self.server = self.coordinator.serve("127.0.0.1", self.port)
+
+    def client(self, worker):
+        return CoordinatorClient(self.url, worker, timeout=5, max_delay=1)
+
+    def pending_shards(self):
+        return self.queue.connection.execute(
+            "SELECT key FROM tasks WHERE state = 'pending' ORDER BY id").fetchall()
+
+    def test_first_page_ack_splits_the_district(self):
+        self.serve()
+        client = self.client("w1")
+
+        task, drained = client.lease()
+        self.assertFalse(drained)
+        self.assertEqual(task["payload"], {"district_id": "1", "district": "Pune", "start": 0, "stop": 1})
+
+        self.assertTrue(client.ack(task, [{"Project Name": "A"}], total_pages=25))
+        self.assertEqual(self.pending_shards(), [("shard:1:1",), ("shard:1:11",), ("shard:1:21",)])
+
+        stops = []
+        while True:
+            task, drained = client.lease()
+            if task is None:
+                break
+            stops.append((task["payload"]["start"], task["payload"]["stop"]))
+            # Only the first page reports the page count, a later shard's total_pages splits nothing.
+            self.assertTrue(client.ack(task, [], total_pages=25))
+
+        self.assertEqual(stops, [(1, 11), (11, 21), (21, 25)])
+        self.assertTrue(drained)
+
+    def test_stale_ack_splits_nothing(self):
+        self.serve()
+        stale = self.client("w1")
+        task, _ = stale.lease()
+
+        self.queue.connection.execute("UPDATE tasks SET available_at = 0")
+        current = self.client("w2")
+        retaken, _ = current.lease()
+        self.assertEqual(retaken["id"], task["id"])
+
+        self.assertFalse(stale.ack(task, [], total_pages=100))
+        self.assertEqual(self.pending_shards(), [])
+        self.assertTrue(current.ack(retaken, [], total_pages=12))
+        self.assertEqual(self.pending_shards(), [("shard:1:1",), ("shard:1:11",)])
+
+    def test_split_uses_the_stored_payload(self):
+        self.serve()
+        task, _ = self.client("w1").lease()
+
+        resp = requests.post(self.url + "/ack", json={
+            "worker": "w1", "id": task["id"], "total_pages": 3,
+            "payload": {"district_id": "9", "district": "Forged", "start": 0, "stop": 1},
+        })
+        self.assertEqual(resp.json(), {"ok": True})
+        self.assertEqual(self.pending_shards(), [("shard:1:1",)])
+
+    def test_client_waits_for_a_coordinator_that_is_not_up_yet(self):
+        starter = threading.Timer(1.5, self.serve)
+        starter.start()
+        self.addCleanup(starter.join)
+
+        started = time.monotonic()
+        task, drained = self.client("w1").lease()
+        self.assertGreater(time.monotonic() - started, 1.5)
+        self.assertEqual(task["key"], "shard:1:0")
+        self.assertFalse(drained)
+
+    def test_status_reports_a_drained_queue(self):
+        self.serve()
+        client = self.client("w1")
+        task, _ = client.lease()
+        client.ack(task, None)
+
+        self.assertEqual(client.lease(), (None, True))
+        self.assertEqual(requests.post(self.url + "/status", json={}).json(),
+                         {"counts": {"done": 1}, "drained": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from resources.journal import ProjectJournal
+from resources.verifier import MahareraitVerifier
+
+
+class ProjectJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def reopen(self, journal, compact_every=1000):
+        journal.close()
+        return ProjectJournal(self.path, compact_every)
+
+    def test_projects_after_the_last_checkpoint_are_pending(self):
+        journal = ProjectJournal(self.path)
+        journal.add("a", {"Project Name": "A"})
+        journal.checkpoint(100)
+        journal.add("b", {"Project Name": "B"})
+
+        journal = self.reopen(journal)
+        self.assertTrue(journal.is_done("a"))
+        self.assertTrue(journal.is_done("b"))
+        self.assertEqual(journal.csv_offset, 100)
+        self.assertEqual(journal.pending, [{"Project Name": "B"}])
+        journal.close()
+
+    def test_torn_line_is_dropped(self):
+        journal = ProjectJournal(self.path)
+        journal.add("a", {"Project Name": "A"})
+        journal.close()
+        valid_size = os.path.getsize(self.path)
+
+        with open(self.path, "ab") as f:
+            f.write(b'{"op": "project", "key": "b", "da')
+
+        journal = ProjectJournal(self.path)
+        self.assertTrue(journal.is_done("a"))
+        self.assertFalse(journal.is_done("b"))
+        self.assertEqual(os.path.getsize(self.path), valid_size)
+
+        # New entries go after the last whole line.
+        journal.add("c", {"Project Name": "C"})
+        journal = self.reopen(journal)
+        self.assertEqual(journal.done, {"a", "c"})
+        journal.close()
+
+    def test_complete_json_without_newline_is_torn(self):
+        with open(self.path, "wb") as f:
+            f.write(json.dumps({"op": "project", "key": "a", "data": {}}).encode("utf-8"))
+
+        journal = ProjectJournal(self.path)
+        self.assertFalse(journal.is_done("a"))
+        self.assertEqual(os.path.getsize(self.path), 0)
+        journal.close()
+
+    def test_compaction_keeps_done_keys_and_offset(self):
+        journal = ProjectJournal(self.path, compact_every=3)
+        journal.add("a", {})
+        journal.add("b", {})
+        journal.checkpoint(42)
+
+        with open(self.path, "rb") as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), {"op": "compacted", "done": ["a", "b"], "csv_offset": 42})
+
+        journal.add("c", {"Project Name": "C"})
+        journal = self.reopen(journal, compact_every=3)
+        self.assertEqual(journal.done, {"a", "b", "c"})
+        self.assertEqual(journal.csv_offset, 42)
+        self.assertEqual(journal.pending, [{"Project Name": "C"}])
+        journal.close()
+
+    def test_reset_forgets_finished_projects(self):
+        journal = ProjectJournal(self.path)
+        journal.add("a", {})
+        journal.reset(10)
+
+        journal = self.reopen(journal)
+        self.assertFalse(journal.is_done("a"))
+        self.assertEqual(journal.csv_offset, 10)
+        self.assertEqual(journal.pending, [])
+        journal.close()
+
+
+class RecoverJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        directory = self.directory.name
+
+        class Verifier(MahareraitVerifier):
+            csv_path = os.path.join(directory, "out.csv")
+            journal_path = os.path.join(directory, "journal.jsonl")
+            parquet_path = None
+            sqlite_path = None
+            response_cache = None
+            parse_processes = 0
+
+        self.verifier_class = Verifier
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_names(self):
+        with open(self.verifier_class.csv_path, newline="", encoding="utf-8") as f:
+            return [row["Project Name"] for row in csv.DictReader(f)]
+
+    def test_recovery_truncates_the_csv_and_writes_pending_projects_again(self):
+        verifier = self.verifier_class(None)
+        verifier.recover_journal()
+        verifier.save_projects([{"Project Name": "A"}])
+        verifier.checkpoint_journal()
+
+        # Written but never checkpointed, then a crash.
+        verifier.journal.add("b", {"Project Name": "B"})
+        verifier.save_projects([{"Project Name": "B"}, {"Project Name": "torn"}])
+        verifier.checkpoint_writers()
+        verifier.journal.close()
+        verifier.close_writers()
+
+        verifier = self.verifier_class(None)
+        verifier.recover_journal()
+        verifier.close_writers()
+        verifier.journal.close()
+
+        self.assertEqual(self.read_names(), ["A", "B"])
+
+    def test_parquet_output_cannot_be_journaled(self):
+        verifier_class = type("Verifier", (self.verifier_class,), {"parquet_path": "out"})
+        with self.assertRaises(ValueError):
+            verifier_class(None).search_query()
+
+
+if __name__ == "__main__":
+    unittest.main()
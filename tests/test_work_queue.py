@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from resources.work_queue import WorkQueue
+
+
+class WorkQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        patcher = mock.patch("resources.work_queue.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = WorkQueue(os.path.join(self.directory.name, "queue.sqlite3"), lease_seconds=60,
+                               max_attempts=3, retry_delay=5, max_retry_delay=8)
+
+    def tearDown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    def dead_letters(self):
+        return self.queue.connection.execute("SELECT key, attempts, last_error FROM dead_letters").fetchall()
+
+    def test_tasks_are_leased_in_order_and_keys_are_queued_once(self):
+        self.queue.put_many("page", [("a", {"n": 1}), ("b", {"n": 2})])
+        self.queue.put("page", "a", {"n": 3})
+
+        first = self.queue.lease("w1")
+        second = self.queue.lease("w2")
+        self.assertEqual((first.key, first.payload, first.attempts), ("a", {"n": 1}, 1))
+        self.assertEqual(second.key, "b")
+        self.assertIsNone(self.queue.lease("w3"))
+        self.assertFalse(self.queue.is_drained())
+
+        self.assertTrue(self.queue.ack(first, {"done": 1}))
+        self.assertTrue(self.queue.ack(second))
+        self.assertTrue(self.queue.is_drained())
+        self.assertEqual([result for batch in self.queue.iter_results() for _, result in batch], [{"done": 1}])
+
+    def test_expired_lease_goes_to_another_worker(self):
+        self.queue.put("page", "a", {})
+        task = self.queue.lease("w1")
+
+        self.now += 59
+        self.assertIsNone(self.queue.lease("w2"))
+        self.assertTrue(self.queue.renew(task))
+
+        self.now += 61
+        retaken = self.queue.lease("w2")
+        self.assertEqual((retaken.id, retaken.attempts, retaken.worker), (task.id, 2, "w2"))
+        self.assertFalse(self.queue.renew(task))
+
+    def test_ack_from_a_stale_holder_is_ignored(self):
+        self.queue.put("page", "a", {})
+        stale = self.queue.lease("w1")
+        self.now += 61
+        current = self.queue.lease("w2")
+
+        self.assertFalse(self.queue.ack(stale, {"from": "w1"}))
+        self.assertEqual(self.queue.counts(), {"leased": 1})
+        self.assertTrue(self.queue.ack(current, {"from": "w2"}))
+        self.assertEqual([result for batch in self.queue.iter_results() for _, result in batch], [{"from": "w2"}])
+
+        # A late failure report from the stale holder does not touch the finished task either.
+        self.queue.fail(stale, "late")
+        self.assertEqual(self.queue.counts(), {"done": 1})
+
+    def test_failed_task_backs_off_exponentially_up_to_the_limit(self):
+        self.queue.put("page", "a", {})
+
+        self.queue.fail(self.queue.lease("w1"), "boom")
+        self.assertEqual(self.queue.counts(), {"pending": 1})
+        self.now += 4.9
+        self.assertIsNone(self.queue.lease("w1"))
+        self.now += 0.1
+        task = self.queue.lease("w1")
+        self.assertEqual(task.attempts, 2)
+
+        # 5 * 2 would be 10 seconds, capped at max_retry_delay.
+        self.queue.fail(task, "boom")
+        self.now += 7.9
+        self.assertIsNone(self.queue.lease("w1"))
+        self.now += 0.1
+        self.assertEqual(self.queue.lease("w1").attempts, 3)
+
+    def test_task_failing_max_attempts_times_goes_to_the_dead_letters(self):
+        self.queue.put("page", "a", {})
+        for _ in range(3):
+            task = self.queue.lease("w1")
+            self.queue.fail(task, f"boom {task.attempts}")
+            self.now += 60
+
+        self.assertIsNone(self.queue.lease("w1"))
+        self.assertEqual(self.queue.counts(), {"dead": 1})
+        self.assertTrue(self.queue.is_drained())
+        self.assertEqual(self.dead_letters(), [("a", 3, "boom 3")])
+
+        self.queue.requeue_dead_letters()
+        self.assertEqual(self.queue.lease("w1").attempts, 1)
+        self.assertEqual(self.dead_letters(), [])
+
+    def test_lease_expiring_on_the_last_attempt_goes_to_the_dead_letters(self):
+        self.queue.put("page", "a", {})
+        for _ in range(3):
+            self.assertIsNotNone(self.queue.lease("w1"))
+            self.now += 61
+
+        self.assertIsNone(self.queue.lease("w2"))
+        self.assertEqual(self.queue.counts(), {"dead": 1})
+        self.assertEqual(self.dead_letters(), [("a", 3, "lease expired")])
+
+
+if __name__ == "__main__":
+    unittest.main()